@@ -1,48 +1,65 @@
-from flask import Flask, render_template, redirect, url_for, flash, request, jsonify
+from flask import (
+    Flask, Blueprint, Response, current_app, render_template, redirect, url_for, flash, request, jsonify,
+    stream_with_context, send_from_directory, abort
+)
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
-from werkzeug.utils import secure_filename
+from sqlalchemy.orm import joinedload
+from werkzeug.middleware.proxy_fix import ProxyFix
 from functools import wraps
+import click
+import hmac
 import os
-from datetime import datetime
-from PIL import Image
-from io import BytesIO
+from datetime import datetime, timedelta
 
 from config import Config
-from models import db, User, Post, Comment, Notification
+from models import db, User, Post, Comment, Notification, notification_actors, recount_counters
 from forms import SignUpForm, LoginForm, UpdateProfileForm, PostForm, CommentForm
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-# 업로드 폴더 생성
-os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
-
-# 기본 프로필 이미지 생성
-try:
-    from create_default_image import *
-except ImportError:
-    pass
-
-db.init_app(app)
+from loaders import (
+    paginate_post_cards, get_post_card, paginate_comment_cards,
+    post_cards_version, post_card_version, comment_cards_version
+)
+from conditional import conditional
+from assets import assets, build_assets, VendorError
+from pagination import KeysetPage, keyset_paginate
+from events import broker, notification_stream, queue_unread_update
+from notifications import notify, NOTIFY_COMMENT, NOTIFY_LIKE, NOTIFY_SIGNUP
+from images import (
+    save_image, finish_upload, remove_raw, move_legacy_raw, run_image_job, pending_images, process_image,
+    is_processed, release_image, collect_garbage, has_variants, variant_filename, image_variants, IMAGE_PENDING, IMAGE_READY
+)
+import storage
+from cache import fragment_cache
+from identity import identity_cache
+from metrics import metrics
+from moderation import (
+    approve_users, reject_users, purge_user, rejected_user_ids, admin_users_query, MAX_BULK_USERS
+)
+from search import search, rebuild_search_index
+from security import verify_password, allow_login_attempt, login_succeeded, PasswordHashBusy
+
+# 라우트/템플릿 함수/관리 명령은 블루프린트에 모으고, 앱은 create_app()에서 만든다.
+# import 시점에는 파일/데이터베이스를 건드리지 않으므로 gunicorn --preload로 미리 불러와도 안전하다.
+# 폴더/기본 이미지/스키마/관리자 계정 준비는 'flask --app app bootstrap'에서 한 번만 한다.
+bp = Blueprint('main', __name__, cli_group=None)
 
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 login_manager.login_message = '로그인이 필요합니다'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # 매 요청 User 행 전체 대신 캐시된 가벼운 사용자 정보를 쓴다 (identity.py)
+    return identity_cache.load(int(user_id))
 
 # 오류 핸들러
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(error):
     print(f"500 Error: {error}")
     import traceback
     traceback.print_exc()
     return render_template('500.html'), 500
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def not_found_error(error):
     return render_template('404.html'), 404
 
@@ -51,7 +68,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated or not current_user.is_admin:
             flash('관리자만 접근할 수 있습니다', 'danger')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         return f(*args, **kwargs)
     return decorated_function
 
@@ -59,65 +76,77 @@ def approved_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated:
-            return redirect(url_for('login'))
+            return redirect(url_for('main.login'))
         if not current_user.is_approved:
             flash('아직 관리자의 승인이 필요합니다', 'warning')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         return f(*args, **kwargs)
     return decorated_function
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
-
-def save_image(file, prefix='post'):
-    if not file or not allowed_file(file.filename):
-        return None
-    
-    try:
-        img = Image.open(file)
-        img.thumbnail((1200, 1200))
-        
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = secure_filename(f"{prefix}_{timestamp}_{file.filename}")
-        filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-        
-        img.save(filepath)
-        return filename
-    except Exception as e:
-        print(f"Error saving image: {e}")
-        return None
-
-# 데이터베이스 초기화
-with app.app_context():
-    db.create_all()
-    
-    admin = User.query.filter_by(username='admin').first()
-    if not admin:
-        admin = User(
-            username='admin',
-            email='admin@teamsns.com',
-            display_name='관리자',
-            is_admin=True,
-            is_approved=True
-        )
-        admin.set_password('admin123')
-        db.session.add(admin)
-        db.session.commit()
-        print("관리자 계정이 생성되었습니다. (username: admin, password: admin123)")
+# 업로드 파일 제공. 해시 이름 파일은 내용이 바뀌지 않으므로 1년간 재검증 없이 캐시한다.
+@bp.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    # 옮기기 전에 남아 있을 수 있는 처리 전 원본(raw/)은 제공하지 않는다
+    if filename.startswith('raw/'):
+        abort(404)
+    digest = storage.content_digest(filename)
+    if digest is None:
+        return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, max_age=3600)
+    
+    # 변환본마다 ETag가 달라야 하므로 해시 뒤에 파일 이름의 크기/형식 부분을 붙인다
+    etag = digest + filename.rsplit(digest, 1)[1]
+    response = send_from_directory(current_app.config['UPLOAD_FOLDER'], filename, etag=etag, max_age=31536000)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+# 빌드된 정적 파일 (assets.py). 이름에 내용 해시가 들어 있어 재검증 없이 캐시한다.
+@bp.route('/assets/<path:filename>')
+def asset(filename):
+    return assets.send(filename)
+
+@bp.app_template_global()
+def asset_url(path):
+    return assets.url(path)
+
+@bp.app_template_global()
+def upload_url(filename):
+    return url_for('main.uploaded_file', filename=filename)
+
+# 처리 중이거나 실패한 프로필 이미지는 기본 이미지로 대신 보여준다
+# size를 주면 해당 크기의 변환본(있을 때)을 가리킨다
+@bp.app_template_global()
+def profile_image_url(user, size=None):
+    filename = user.profile_image or 'default_profile.jpg'
+    if user.profile_image_status != IMAGE_READY:
+        filename = 'default_profile.jpg'
+    if size and has_variants(filename):
+        filename = variant_filename(filename, size, 'fallback')
+    return upload_url(filename)
+
+# 템플릿의 srcset용 변환본 목록 (_macros.html 참고)
+@bp.app_template_global()
+def image_srcset(filename):
+    return image_variants(filename, upload_url)
+
+# 게시물 카드에서 보는 사람과 무관한 부분을 캐시한다 (cache.py)
+# 사용법: {% call cached_fragment('feed-header', card) %}...{% endcall %}
+@bp.app_template_global()
+def cached_fragment(name, card, caller):
+    return fragment_cache.render(name, card.post.id, card.version, caller)
 
 # ===== 인증 관련 라우트 =====
-@app.route('/')
+@bp.route('/')
 def index():
     if current_user.is_authenticated:
         if not current_user.is_approved:
-            return redirect(url_for('waiting_approval'))
-        return redirect(url_for('feed'))
-    return redirect(url_for('login'))
+            return redirect(url_for('main.waiting_approval'))
+        return redirect(url_for('main.feed'))
+    return redirect(url_for('main.login'))
 
-@app.route('/signup', methods=['GET', 'POST'])
+@bp.route('/signup', methods=['GET', 'POST'])
 def signup():
     if current_user.is_authenticated:
-        return redirect(url_for('feed'))
+        return redirect(url_for('main.feed'))
     
     form = SignUpForm()
     if form.validate_on_submit():
@@ -126,81 +155,194 @@ def signup():
             email=form.email.data,
             display_name=form.display_name.data
         )
-        user.set_password(form.password.data)
+        try:
+            user.set_password(form.password.data)
+        except PasswordHashBusy:
+            flash('요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요', 'warning')
+            return render_template('signup.html', form=form), 503
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
         # 관리자에게 알림
         admin = User.query.filter_by(is_admin=True).first()
         if admin:
-            notification = Notification(
-                user_id=admin.id,
-                type='approval',
-                message=f'{form.display_name.data}님이 가입 승인을 기다리고 있습니다',
-                related_user_id=user.id
-            )
-            db.session.add(notification)
-            db.session.commit()
+            notify(NOTIFY_SIGNUP, admin.id, actor_id=user.id)
+        db.session.commit()
         
         flash('회원가입 신청이 완료되었습니다. 관리자의 승인을 기다려주세요', 'info')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
     
     return render_template('signup.html', form=form)
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('feed'))
+        return redirect(url_for('main.feed'))
     
     form = LoginForm()
     if form.validate_on_submit():
+        # 한도를 넘은 시도는 해시를 계산하기 전에 거절한다
+        if not allow_login_attempt(form.username.data, request.remote_addr):
+            flash('로그인 시도가 너무 많습니다. 잠시 후 다시 시도해주세요', 'danger')
+            return render_template('login.html', form=form), 429
+        
         user = User.query.filter_by(username=form.username.data).first()
         
-        if user and user.check_password(form.password.data):
+        # 거절되어 정리를 기다리는 사용자는 없는 계정과 같이 취급한다
+        # (없는 계정도 같은 비용의 검증을 거쳐 응답 시간으로 계정 존재 여부가 드러나지 않게 함)
+        active = user is not None and user.is_active
+        try:
+            ok, new_hash = verify_password(user.password_hash if active else None, form.password.data)
+        except PasswordHashBusy:
+            flash('요청이 많아 처리하지 못했습니다. 잠시 후 다시 시도해주세요', 'warning')
+            return render_template('login.html', form=form), 503
+        
+        if ok:
+            login_succeeded(form.username.data)
+            # 해시 방식이 바뀌었으면 새 방식으로 다시 저장한다
+            if new_hash:
+                user.password_hash = new_hash
+                db.session.commit()
+            
             if not user.is_approved and not user.is_admin:
                 flash('아직 관리자의 승인이 필요합니다', 'warning')
-                return redirect(url_for('login'))
+                return redirect(url_for('main.login'))
             
             login_user(user)
             next_page = request.args.get('next')
-            return redirect(next_page) if next_page else redirect(url_for('feed'))
+            return redirect(next_page) if next_page else redirect(url_for('main.feed'))
         else:
             flash('사용자명 또는 비밀번호가 잘못되었습니다', 'danger')
     
     return render_template('login.html', form=form)
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('로그아웃되었습니다', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/waiting-approval')
+@bp.route('/waiting-approval')
 @login_required
 def waiting_approval():
     if current_user.is_approved:
-        return redirect(url_for('feed'))
+        return redirect(url_for('main.feed'))
     return render_template('waiting_approval.html')
 
 # ===== 피드 관련 라우트 =====
-@app.route('/feed')
+FEED_CATEGORIES = ['공지', '일상', '게임', '영화']
+
+def feed_query(category):
+    if category and category in FEED_CATEGORIES:
+        return Post.query.filter_by(category=category)
+    return Post.query
+
+def feed_version():
+    category = request.args.get('category', None)
+    if category not in FEED_CATEGORIES:
+        category = None
+    return post_cards_version(
+        feed_query(category), current_user, after=request.args.get('after'), before=request.args.get('before')
+    )
+
+@bp.route('/feed')
 @login_required
 @approved_required
+@conditional(feed_version)
 def feed():
-    page = request.args.get('page', 1, type=int)
     category = request.args.get('category', None)
+    if category not in FEED_CATEGORIES:
+        category = None
     
-    if category and category in ['공지', '일상', '게임', '영화']:
-        posts = Post.query.filter_by(category=category).order_by(Post.created_at.desc()).paginate(page=page, per_page=10)
-    else:
-        posts = Post.query.order_by(Post.created_at.desc()).paginate(page=page, per_page=10)
-    
+    posts, cards = paginate_post_cards(
+        feed_query(category), current_user,
+        after=request.args.get('after'), before=request.args.get('before')
+    )
     form = PostForm()
     
-    return render_template('feed.html', posts=posts, form=form, current_category=category)
+    return render_template('feed.html', posts=posts, cards=cards, form=form, current_category=category)
 
-@app.route('/post/create', methods=['POST'])
+@bp.route('/api/feed')
+@login_required
+@approved_required
+def feed_api():
+    # 무한 스크롤용: 다음 커서 위치의 게시물 카드를 HTML 조각으로 돌려준다
+    category = request.args.get('category', None)
+    if category not in FEED_CATEGORIES:
+        category = None
+    
+    posts, cards = paginate_post_cards(feed_query(category), current_user, after=request.args.get('after'))
+    html = ''.join(render_template('_post_card.html', card=card, post=card.post) for card in cards)
+    
+    return jsonify({
+        'html': html,
+        'next_cursor': posts.next_cursor
+    })
+
+# ===== 검색 =====
+def search_params():
+    text = request.args.get('q', '').strip()
+    category = request.args.get('category') or None
+    if category not in FEED_CATEGORIES:
+        category = None
+    author = None
+    author_name = request.args.get('author', '').strip()
+    if author_name:
+        author = User.query.filter_by(username=author_name).first()
+    return text, category, author_name, author
+
+def run_search(text, category, author_name, author):
+    # 없는 작성자로 거르면 결과도 없다
+    if author_name and author is None:
+        return KeysetPage([])
+    return search(
+        text, current_user, category=category, author_id=author.id if author else None,
+        after=request.args.get('after')
+    )
+
+@bp.route('/search')
+@login_required
+@approved_required
+def search_page():
+    text, category, author_name, author = search_params()
+    results = run_search(text, category, author_name, author)
+    return render_template(
+        'search.html', results=results, q=text, current_category=category,
+        author_name=author_name, categories=FEED_CATEGORIES
+    )
+
+@bp.route('/api/search')
+@login_required
+@approved_required
+def search_api():
+    text, category, author_name, author = search_params()
+    results = run_search(text, category, author_name, author)
+    
+    items = []
+    for hit in results.items:
+        target = hit.card.post if hit.kind == 'post' else hit.comment
+        items.append({
+            'type': hit.kind,
+            'post_id': hit.post.id,
+            'comment_id': hit.comment.id if hit.comment else None,
+            'content': target.content,
+            'category': hit.post.category,
+            'author': {
+                'id': target.author.id,
+                'username': target.author.username,
+                'display_name': target.author.display_name
+            },
+            'created_at': target.created_at.isoformat(),
+            'url': url_for('main.view_post', post_id=hit.post.id)
+        })
+    
+    return jsonify({
+        'results': items,
+        'next_cursor': results.next_cursor
+    })
+
+@bp.route('/post/create', methods=['POST'])
 @login_required
 @approved_required
 def create_post():
@@ -208,79 +350,109 @@ def create_post():
     if form.validate_on_submit():
         image_filename = None
         if form.image.data:
-            image_filename = save_image(form.image.data, 'post')
+            image_filename = save_image(form.image.data)
+        # 참조를 먼저 잡은 뒤, 같은 이미지가 이미 처리되어 있으면 바로 사용한다
+        storage.acquire(image_filename)
+        image_pending = bool(image_filename) and not is_processed(image_filename)
         
         post = Post(
             content=form.content.data,
             category=form.category.data,
             image_filename=image_filename,
+            image_status=IMAGE_PENDING if image_pending else IMAGE_READY,
             user_id=current_user.id
         )
         db.session.add(post)
         db.session.commit()
         
+        # 이미지 변환은 백그라운드에서 처리하고, 끝날 때까지 피드에는 자리표시자가 보인다
+        finish_upload('post', post.id, image_filename, image_pending)
+        
         flash('게시물이 작성되었습니다', 'success')
     
-    return redirect(url_for('feed'))
+    return redirect(url_for('main.feed'))
+
+def post_version(post_id):
+    post = post_card_version(post_id, current_user)
+    if post is None:
+        return None
+    return post, comment_cards_version(post_id, current_user, after=request.args.get('after'))
 
-@app.route('/post/<int:post_id>')
+@bp.route('/post/<int:post_id>')
 @login_required
 @approved_required
+@conditional(post_version)
 def view_post(post_id):
-    post = Post.query.get_or_404(post_id)
+    card = get_post_card(post_id, current_user)
     form = CommentForm()
+    comments, comment_cards = paginate_comment_cards(post_id, current_user, after=request.args.get('after'))
     
-    return render_template('post_detail.html', post=post, form=form)
+    return render_template(
+        'post_detail.html', post=card.post, card=card, form=form,
+        comments=comments, comment_cards=comment_cards
+    )
+
+@bp.route('/api/post/<int:post_id>/comments')
+@login_required
+@approved_required
+def comments_api(post_id):
+    # 댓글 더 보기: 다음 커서 위치의 댓글을 HTML 조각으로 돌려준다
+    comments, comment_cards = paginate_comment_cards(post_id, current_user, after=request.args.get('after'))
+    html = ''.join(
+        render_template('_comment_card.html', comment_card=comment_card, comment=comment_card.comment)
+        for comment_card in comment_cards
+    )
+    
+    return jsonify({
+        'html': html,
+        'next_cursor': comments.next_cursor
+    })
 
-@app.route('/post/<int:post_id>/delete', methods=['POST'])
+@bp.route('/post/<int:post_id>/delete', methods=['POST'])
 @login_required
 def delete_post(post_id):
     post = Post.query.get_or_404(post_id)
     
     if post.user_id != current_user.id and not current_user.is_admin:
         flash('권한이 없습니다', 'danger')
-        return redirect(url_for('feed'))
+        return redirect(url_for('main.feed'))
     
+    image_filename = post.image_filename
+    release_image(image_filename)
     db.session.delete(post)
     db.session.commit()
+    collect_garbage([image_filename])
+    fragment_cache.invalidate_post(post_id)
     
     flash('게시물이 삭제되었습니다', 'success')
-    return redirect(url_for('feed'))
+    return redirect(url_for('main.feed'))
 
-@app.route('/post/<int:post_id>/like', methods=['POST'])
+# PUT은 좋아요, DELETE는 취소. 같은 요청을 여러 번 보내도 결과가 같다.
+@bp.route('/post/<int:post_id>/like', methods=['PUT', 'DELETE'])
 @login_required
 @approved_required
 def like_post(post_id):
     post = Post.query.get_or_404(post_id)
     
-    if current_user.has_liked_post(post):
-        current_user.unlike_post(post)
-        liked = False
-    else:
-        current_user.like_post(post)
+    if request.method == 'PUT':
         liked = True
-        
-        # 게시물 작성자에게 알림
-        if post.author.id != current_user.id:
-            notification = Notification(
-                user_id=post.author.id,
-                type='like',
-                message=f'{current_user.display_name}님이 당신의 게시물을 좋아합니다',
-                related_user_id=current_user.id,
-                related_post_id=post.id
-            )
-            db.session.add(notification)
+        # 게시물 작성자에게 알림 (새로 좋아요한 경우만)
+        if current_user.like_post(post) and post.user_id != current_user.id:
+            notify(NOTIFY_LIKE, post.user_id, actor_id=current_user.id, post_id=post.id)
+    else:
+        liked = False
+        current_user.unlike_post(post)
     
     db.session.commit()
     
     return jsonify({
         'success': True,
         'liked': liked,
-        'likes_count': post.get_likes_count()
+        'likes_count': post.likes_count
     })
 
 # ===== 댓글 관련 라우트 =====
-@app.route('/post/<int:post_id>/comment/add', methods=['POST'])
+@bp.route('/post/<int:post_id>/comment/add', methods=['POST'])
 @login_required
 @approved_required
 def add_comment(post_id):
@@ -294,25 +466,18 @@ def add_comment(post_id):
             post_id=post.id
         )
         db.session.add(comment)
-        db.session.commit()
+        post.comments_count = Post.comments_count + 1
+        post.updated_at = Post.updated_at
         
         # 게시물 작성자에게 알림
-        if post.author.id != current_user.id:
-            notification = Notification(
-                user_id=post.author.id,
-                type='comment',
-                message=f'{current_user.display_name}님이 당신의 게시물에 댓글을 남겼습니다',
-                related_user_id=current_user.id,
-                related_post_id=post.id
-            )
-            db.session.add(notification)
-            db.session.commit()
+        notify(NOTIFY_COMMENT, post.user_id, actor_id=current_user.id, post_id=post.id)
+        db.session.commit()
         
         flash('댓글이 작성되었습니다', 'success')
     
-    return redirect(url_for('view_post', post_id=post.id))
+    return redirect(url_for('main.view_post', post_id=post.id))
 
-@app.route('/comment/<int:comment_id>/delete', methods=['POST'])
+@bp.route('/comment/<int:comment_id>/delete', methods=['POST'])
 @login_required
 def delete_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
@@ -320,72 +485,80 @@ def delete_comment(comment_id):
     
     if comment.user_id != current_user.id and not current_user.is_admin:
         flash('권한이 없습니다', 'danger')
-        return redirect(url_for('view_post', post_id=post_id))
+        return redirect(url_for('main.view_post', post_id=post_id))
     
+    comment.post.comments_count = Post.comments_count - 1
+    comment.post.updated_at = Post.updated_at
     db.session.delete(comment)
     db.session.commit()
     
     flash('댓글이 삭제되었습니다', 'success')
-    return redirect(url_for('view_post', post_id=post_id))
+    return redirect(url_for('main.view_post', post_id=post_id))
 
-@app.route('/comment/<int:comment_id>/like', methods=['POST'])
+@bp.route('/comment/<int:comment_id>/like', methods=['PUT', 'DELETE'])
 @login_required
 @approved_required
 def like_comment(comment_id):
     comment = Comment.query.get_or_404(comment_id)
     
-    if current_user.has_liked_comment(comment):
-        current_user.unlike_comment(comment)
-        liked = False
-    else:
-        current_user.like_comment(comment)
+    if request.method == 'PUT':
         liked = True
-        
-        # 댓글 작성자에게 알림
-        if comment.author.id != current_user.id:
-            notification = Notification(
-                user_id=comment.author.id,
-                type='like',
-                message=f'{current_user.display_name}님이 당신의 댓글을 좋아합니다',
-                related_user_id=current_user.id,
-                related_post_id=comment.post_id
-            )
-            db.session.add(notification)
+        # 댓글 작성자에게 알림 (새로 좋아요한 경우만)
+        if current_user.like_comment(comment) and comment.user_id != current_user.id:
+            notify(NOTIFY_LIKE, comment.user_id, actor_id=current_user.id, post_id=comment.post_id, comment_id=comment.id)
+    else:
+        liked = False
+        current_user.unlike_comment(comment)
     
     db.session.commit()
     
     return jsonify({
         'success': True,
         'liked': liked,
-        'likes_count': comment.get_likes_count()
+        'likes_count': comment.likes_count
     })
 
 # ===== 프로필 관련 라우트 =====
-@app.route('/profile/edit', methods=['GET', 'POST'])
+@bp.route('/profile/edit', methods=['GET', 'POST'])
 @login_required
 @approved_required
 def edit_profile():
     form = UpdateProfileForm()
     
     if form.validate_on_submit():
+        user = current_user.row
         try:
-            current_user.display_name = form.display_name.data
-            current_user.bio = form.bio.data
+            user.display_name = form.display_name.data
+            user.bio = form.bio.data
+            # 작성자 이름/이미지가 들어간 게시물 카드 캐시를 무효화한다
+            user.profile_updated_at = datetime.utcnow()
             
             # 새로운 이미지가 업로드된 경우에만 업데이트
+            new_image = None
+            old_image = None
+            image_pending = False
             if form.profile_image.data:
-                image_filename = save_image(form.profile_image.data, 'profile')
-                if image_filename:
-                    # 기존 이미지 삭제 (default_profile.jpg 제외)
-                    if current_user.profile_image and current_user.profile_image != 'default_profile.jpg':
-                        old_image_path = os.path.join(Config.UPLOAD_FOLDER, current_user.profile_image)
-                        if os.path.exists(old_image_path):
-                            os.remove(old_image_path)
-                    current_user.profile_image = image_filename
+                image_filename = save_image(form.profile_image.data)
+                if image_filename and image_filename != user.profile_image:
+                    # 기존 이미지는 참조를 놓고, 커밋 후 아무도 쓰지 않으면 삭제 (default_profile.jpg 제외)
+                    old_image = user.profile_image
+                    release_image(old_image)
+                    storage.acquire(image_filename)
+                    image_pending = not is_processed(image_filename)
+                    new_image = image_filename
+                    user.profile_image = image_filename
+                    user.profile_image_status = IMAGE_PENDING if image_pending else IMAGE_READY
+                elif image_filename and is_processed(image_filename):
+                    # 지금과 같은 이미지를 다시 올린 경우 원본만 정리한다
+                    remove_raw(image_filename)
             
             db.session.commit()
+            identity_cache.invalidate(user.id)
+            if old_image:
+                collect_garbage([old_image])
+            finish_upload('profile', current_user.id, new_image, image_pending)
             flash('프로필이 업데이트되었습니다', 'success')
-            return redirect(url_for('view_profile', user_id=current_user.id))
+            return redirect(url_for('main.view_profile', user_id=current_user.id))
         except Exception as e:
             db.session.rollback()
             print(f"Edit Profile Error: {str(e)}")
@@ -399,80 +572,186 @@ def edit_profile():
     
     return render_template('edit_profile.html', form=form)
 
-@app.route('/profile/<int:user_id>')
+def profile_version(user_id):
+    # 프로필 정보와 게시물/댓글 수는 쿼리 1번, 게시물 페이지는 카드 버전 컬럼만 1번
+    posts_total = db.select(db.func.count(Post.id)).where(Post.user_id == User.id).scalar_subquery()
+    comments_total = db.select(db.func.count(Comment.id)).where(Comment.user_id == User.id).scalar_subquery()
+    user = db.session.query(
+        User.id, User.display_name, User.bio, User.profile_image, User.profile_image_status,
+        User.profile_updated_at, posts_total, comments_total
+    ).filter(User.id == user_id).first()
+    if user is None:
+        return None
+    return tuple(user), post_cards_version(
+        Post.query.filter_by(user_id=user_id), current_user,
+        after=request.args.get('after'), before=request.args.get('before')
+    )
+
+@bp.route('/profile/<int:user_id>')
 @login_required
 @approved_required
+@conditional(profile_version)
 def view_profile(user_id):
     try:
         # 사용자 조회
         user = User.query.filter_by(id=user_id).first()
         if not user:
             flash('존재하지 않는 사용자입니다.', 'danger')
-            return redirect(url_for('feed'))
-        
-        page = request.args.get('page', 1, type=int)
+            return redirect(url_for('main.feed'))
         
         # 게시물 조회
-        posts_query = Post.query.filter_by(user_id=user_id).order_by(Post.created_at.desc())
-        posts = posts_query.paginate(page=page, per_page=10)
+        posts, cards = paginate_post_cards(
+            Post.query.filter_by(user_id=user_id), current_user,
+            after=request.args.get('after'), before=request.args.get('before'), with_total=True
+        )
         
-        # 게시물과 댓글 수 계산
-        posts_count = posts_query.count()
+        # 게시물과 댓글 수 계산 (게시물 수는 페이지네이션의 전체 개수를 재사용)
+        posts_count = posts.total
         comments_count = Comment.query.filter_by(user_id=user_id).count()
         
-        return render_template('profile.html', user=user, posts=posts, posts_count=posts_count, comments_count=comments_count)
+        return render_template('profile.html', user=user, posts=posts, cards=cards, posts_count=posts_count, comments_count=comments_count)
     except Exception as e:
         print(f"Profile Error: {str(e)}")
         import traceback
         traceback.print_exc()
         flash('프로필을 불러올 수 없습니다.', 'danger')
-        return redirect(url_for('feed'))
+        return redirect(url_for('main.feed'))
 
 # ===== 알림 관련 라우트 =====
-@app.route('/notifications')
+@bp.route('/notifications')
 @login_required
 def notifications():
-    notifications_list = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).all()
+    # 최신 20개씩 커서로 끊어 읽고, 보낸 사람은 JOIN으로 함께 가져온다
+    query = Notification.query.filter_by(user_id=current_user.id).options(joinedload(Notification.related_user))
+    notifications_page = keyset_paginate(
+        query, Notification,
+        after=request.args.get('after'), before=request.args.get('before'), per_page=20
+    )
     
-    return render_template('notifications.html', notifications=notifications_list[:20])
+    return render_template('notifications.html', notifications=notifications_page)
 
-@app.route('/notification/<int:notification_id>/read', methods=['POST'])
+@bp.route('/notification/<int:notification_id>/read', methods=['POST'])
 @login_required
 def read_notification(notification_id):
-    notification = Notification.query.get_or_404(notification_id)
-    
-    if notification.user_id != current_user.id:
-        return jsonify({'success': False}), 403
-    
-    notification.is_read = True
+    # 읽지 않은 경우에만 바꾸는 조건부 UPDATE: 클릭과 sendBeacon이 동시에 와도 카운터는 한 번만 줄어든다
+    updated = Notification.query.filter_by(
+        id=notification_id, user_id=current_user.id, is_read=False
+    ).update({Notification.is_read: True}, synchronize_session=False)
+    
+    if not updated:
+        owner_id = db.session.query(Notification.user_id).filter_by(id=notification_id).scalar()
+        if owner_id is None:
+            abort(404)
+        if owner_id != current_user.id:
+            return jsonify({'success': False}), 403
+    
+    decrement_unread_count(current_user.id, updated)
     db.session.commit()
     
     return jsonify({'success': True})
 
-@app.route('/api/notifications/unread-count')
+def decrement_unread_count(user_id, amount):
+    # 커밋되면 열려 있는 다른 탭의 알림 스트림에도 바뀐 미읽음 개수를 보낸다
+    if amount:
+        User.query.filter_by(id=user_id).update(
+            {User.unread_notifications_count: User.unread_notifications_count - amount},
+            synchronize_session=False
+        )
+        queue_unread_update(db.session, user_id)
+
+@bp.route('/notifications/read', methods=['POST'])
+@login_required
+def read_notifications():
+    # {"ids": [...]}면 해당 알림만, {"all": true}면 전체를 UPDATE 한 번으로 읽음 처리 (빈 목록은 아무것도 하지 않음)
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'message': '잘못된 요청입니다'}), 400
+    
+    query = Notification.query.filter_by(user_id=current_user.id, is_read=False)
+    if data.get('all') is not True:
+        ids = data.get('ids')
+        if not isinstance(ids, list):
+            return jsonify({'success': False, 'message': '잘못된 알림 ID입니다'}), 400
+        try:
+            ids = [int(notification_id) for notification_id in ids]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'message': '잘못된 알림 ID입니다'}), 400
+        if not ids:
+            return jsonify({'success': True, 'updated': 0})
+        query = query.filter(Notification.id.in_(ids))
+    
+    updated = query.update({Notification.is_read: True}, synchronize_session=False)
+    decrement_unread_count(current_user.id, updated)
+    db.session.commit()
+    
+    return jsonify({'success': True, 'updated': updated})
+
+@bp.route('/api/notifications/unread-count')
 @login_required
 def get_unread_notifications_count():
-    count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
-    return jsonify({'count': count})
+    # 저장된 카운터 컬럼 하나만 기본 키로 읽고, 값이 그대로면 304로 본문 없이 응답한다
+    count = db.session.query(User.unread_notifications_count).filter_by(id=current_user.id).scalar()
+    response = jsonify({'count': count})
+    response.set_etag(f'unread-{current_user.id}-{count}')
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@bp.route('/api/notifications/stream')
+@login_required
+def notification_stream_api():
+    # 새 알림과 미읽음 개수를 Server-Sent Events로 밀어준다. 꺼져 있으면 204를 받은 클라이언트가 폴링으로 돌아간다.
+    if not current_app.config['NOTIFICATION_STREAM_ENABLED']:
+        return '', 204
+    # 열린 스트림이 한도에 닿으면 나머지 요청을 처리할 스레드가 남도록 503으로 거절한다 (클라이언트는 폴링으로 전환)
+    if broker.subscriber_count() >= current_app.config['NOTIFICATION_MAX_STREAMS']:
+        return '', 503
+    
+    user_id = current_user.id
+    
+    def unread_count():
+        count = db.session.query(User.unread_notifications_count).filter_by(id=user_id).scalar()
+        # 대기하는 동안 DB 연결을 붙잡지 않는다
+        db.session.remove()
+        return count
+    
+    db.session.remove()
+    stream = notification_stream(
+        user_id, unread_count,
+        timeout=current_app.config['NOTIFICATION_STREAM_TIMEOUT'],
+        heartbeat=current_app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    )
+    response = Response(stream_with_context(stream), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # ===== 관리자 라우트 =====
-@app.route('/admin/users')
+@bp.route('/admin/metrics')
+def admin_metrics():
+    # Prometheus 스크랩용 (metrics.py). 관리자 로그인 또는 'Authorization: Bearer <METRICS_TOKEN>'이 필요하다.
+    if not current_app.config['METRICS_ENABLED']:
+        return Response('metrics disabled\n', status=404, mimetype='text/plain')
+    token = current_app.config['METRICS_TOKEN']
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not (current_user.is_authenticated and current_user.is_admin):
+        return Response('forbidden\n', status=403, mimetype='text/plain')
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+@bp.route('/admin/users')
 @login_required
 @admin_required
 def admin_users():
-    page = request.args.get('page', 1, type=int)
     filter_type = request.args.get('filter', 'pending')
+    after = request.args.get('after')
+    before = request.args.get('before')
     
-    if filter_type == 'pending':
-        users = User.query.filter_by(is_approved=False, is_admin=False).paginate(page=page, per_page=10)
-    elif filter_type == 'approved':
-        users = User.query.filter_by(is_approved=True, is_admin=False).paginate(page=page, per_page=10)
-    else:
-        users = User.query.filter_by(is_admin=False).paginate(page=page, per_page=10)
+    # 전체 개수는 화면에 표시하는 승인 대기 탭에서만 센다
+    users = keyset_paginate(admin_users_query(filter_type), User,
+                            after=after, before=before, with_total=filter_type == 'pending')
     
     return render_template('admin_users.html', users=users, filter_type=filter_type)
 
-@app.route('/admin/user/<int:user_id>/approve', methods=['POST'])
+@bp.route('/admin/user/<int:user_id>/approve', methods=['POST'])
 @login_required
 @admin_required
 def approve_user(user_id):
@@ -481,20 +760,11 @@ def approve_user(user_id):
     if user.is_admin:
         return jsonify({'success': False, 'message': '관리자는 승인할 수 없습니다'}), 400
     
-    user.is_approved = True
-    
-    notification = Notification(
-        user_id=user.id,
-        type='approval',
-        message='관리자님이 당신의 가입을 승인했습니다! 이제 팀 커뮤니티를 즐길 수 있습니다.',
-        related_user_id=current_user.id
-    )
-    db.session.add(notification)
-    db.session.commit()
+    approve_users([user.id], current_user.id)
     
     return jsonify({'success': True})
 
-@app.route('/admin/user/<int:user_id>/reject', methods=['POST'])
+@bp.route('/admin/user/<int:user_id>/reject', methods=['POST'])
 @login_required
 @admin_required
 def reject_user(user_id):
@@ -503,10 +773,222 @@ def reject_user(user_id):
     if user.is_admin:
         return jsonify({'success': False, 'message': '관리자는 거절할 수 없습니다'}), 400
     
-    db.session.delete(user)
-    db.session.commit()
+    # 바로 비활성으로 표시하고, 게시물/댓글/좋아요/알림/이미지는 백그라운드에서 나눠서 지운다 (moderation.py)
+    reject_users([user.id])
     
     return jsonify({'success': True})
 
+def bulk_user_ids():
+    # JSON {"user_ids": [...]} 또는 폼의 user_ids 여러 개
+    # 형식이 잘못되었으면 None (호출한 쪽에서 400)
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not isinstance(data.get('user_ids'), list):
+            return None
+        user_ids = data['user_ids']
+    else:
+        user_ids = request.form.getlist('user_ids')
+    try:
+        return [int(user_id) for user_id in user_ids]
+    except (TypeError, ValueError):
+        return None
+
+@bp.route('/admin/users/approve', methods=['POST'])
+@login_required
+@admin_required
+def approve_users_bulk():
+    user_ids = bulk_user_ids()
+    if not user_ids or len(user_ids) > MAX_BULK_USERS:
+        return jsonify({'success': False, 'message': f'사용자를 1~{MAX_BULK_USERS}명 선택하세요'}), 400
+    
+    approved = approve_users(user_ids, current_user.id)
+    
+    return jsonify({'success': True, 'approved': approved})
+
+@bp.route('/admin/users/reject', methods=['POST'])
+@login_required
+@admin_required
+def reject_users_bulk():
+    user_ids = bulk_user_ids()
+    if not user_ids or len(user_ids) > MAX_BULK_USERS:
+        return jsonify({'success': False, 'message': f'사용자를 1~{MAX_BULK_USERS}명 선택하세요'}), 400
+    
+    rejected = reject_users(user_ids)
+    
+    return jsonify({'success': True, 'rejected': rejected})
+
+# ===== 관리 명령 =====
+# 관리 명령에서만 쓰는 모듈은 명령을 실행할 때 불러온다 (워커가 시작할 때 불러오지 않도록)
+def upgrade_schema():
+    import migrations
+    db.create_all()
+    applied = migrations.upgrade()
+    for version, description in applied:
+        print(f'마이그레이션 {version} 적용: {description}')
+    print(f'현재 스키마 버전: {migrations.current_version()}')
+
+def seed_admin():
+    admin = User.query.filter_by(username='admin').first()
+    if not admin:
+        admin = User(
+            username='admin',
+            email='admin@teamsns.com',
+            display_name='관리자',
+            is_admin=True,
+            is_approved=True
+        )
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        print("관리자 계정이 생성되었습니다. (username: admin, password: admin123)")
+    else:
+        print("관리자 계정이 이미 존재합니다.")
+
+def bootstrap():
+    os.makedirs(current_app.instance_path, exist_ok=True)
+    os.makedirs(current_app.config['UPLOAD_FOLDER'], exist_ok=True)
+    os.makedirs(current_app.config['RAW_UPLOAD_FOLDER'], exist_ok=True)
+    move_legacy_raw()
+    if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], 'default_profile.jpg')):
+        from create_default_image import create_default_image
+        create_default_image(current_app.config['UPLOAD_FOLDER'])
+    upgrade_schema()
+    seed_admin()
+
+@bp.cli.command('bootstrap')
+def bootstrap_command():
+    """폴더, 기본 프로필 이미지, 스키마/마이그레이션, 관리자 계정을 준비합니다 (배포/처음 실행 시 한 번)."""
+    bootstrap()
+
+@bp.cli.command('build-assets')
+@click.option('--refresh-vendor', is_flag=True, help='static/vendor/의 Bootstrap 파일과 SHA256SUMS를 다시 내려받아 씀 (커밋 필요)')
+@click.option('--no-purge', is_flag=True, help='쓰지 않는 CSS 규칙을 지우지 않음')
+def build_assets_command(refresh_vendor, no_purge):
+    """정적 파일에 내용 해시 이름을 붙이고 압축본(.gz/.br)과 manifest.json을 만듭니다 (배포 시)."""
+    try:
+        manifest = build_assets(refresh_vendor=refresh_vendor, purge=not no_purge)
+    except VendorError as e:
+        raise click.ClickException(str(e))
+    print(f"{len(manifest)}개 파일을 빌드했습니다.")
+
+@bp.cli.command('db-upgrade')
+def db_upgrade_command():
+    """기존 데이터베이스에 아직 적용되지 않은 스키마 마이그레이션을 적용합니다."""
+    upgrade_schema()
+
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """주요 라우트의 쿼리가 인덱스를 타는지 확인합니다 (SQLite 전용)."""
+    if db.engine.dialect.name != 'sqlite':
+        print('쿼리 플랜 점검은 SQLite에서만 지원합니다.')
+        return
+    
+    import migrations
+    problems = migrations.check_query_plans()
+    for name, details in problems.items():
+        print(f'[FAIL] {name}: {" / ".join(details)}')
+    if problems:
+        raise SystemExit(1)
+    print('모든 주요 쿼리가 인덱스를 사용합니다.')
+
+@bp.cli.command('repair-counters')
+def repair_counters_command():
+    """좋아요/댓글 카운터를 실제 데이터 기준으로 다시 계산합니다."""
+    recount_counters()
+    print('카운터를 다시 계산했습니다.')
+
+@bp.cli.command('prune-notifications')
+@click.option('--days', type=int, default=None, help='이 일수보다 오래된 읽은 알림을 삭제 (기본: NOTIFICATION_RETENTION_DAYS)')
+@click.option('--batch-size', type=int, default=1000, help='한 트랜잭션에서 삭제할 행 수')
+def prune_notifications_command(days, batch_size):
+    """보관 기간이 지난 읽은 알림을 나누어 삭제합니다."""
+    days = days if days is not None else current_app.config['NOTIFICATION_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    
+    # 쓰기 잠금을 오래 잡지 않도록 batch_size씩 끊어서 커밋한다
+    deleted = 0
+    while True:
+        ids = [notification_id for (notification_id,) in db.session.query(Notification.id)
+               .filter(Notification.is_read == True, Notification.created_at < cutoff)
+               .limit(batch_size)]
+        if not ids:
+            break
+        db.session.execute(notification_actors.delete().where(notification_actors.c.notification_id.in_(ids)))
+        Notification.query.filter(Notification.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+    
+    print(f'{days}일이 지난 읽은 알림 {deleted}개를 삭제했습니다.')
+
+@bp.cli.command('purge-rejected-users')
+def purge_rejected_users_command():
+    """거절되었지만 아직 정리되지 않은 사용자의 게시물/댓글/좋아요/알림/이미지를 지웁니다."""
+    user_ids = rejected_user_ids()
+    for user_id in user_ids:
+        purge_user(user_id)
+    print(f'거절된 사용자 {len(user_ids)}명을 정리했습니다.')
+
+@bp.cli.command('process-pending-images')
+def process_pending_images_command():
+    """재시작 등으로 처리되지 못한 업로드 이미지를 다시 처리합니다."""
+    jobs = list(pending_images())
+    for kind, object_id, filename in jobs:
+        run_image_job(kind, object_id, filename)
+    print(f'대기 중이던 이미지 {len(jobs)}개를 처리했습니다.')
+
+@bp.cli.command('generate-image-variants')
+def generate_image_variants_command():
+    """변환본이 없는 기존 업로드 이미지의 크기별 변환본(WebP 포함)을 만듭니다."""
+    filenames = {filename for (filename,) in db.session.query(Post.image_filename).filter(Post.image_filename != None)}
+    filenames |= {filename for (filename,) in db.session.query(User.profile_image).filter(User.profile_image != None)}
+    filenames.discard('default_profile.jpg')
+    
+    generated = 0
+    for filename in sorted(filenames):
+        path = storage.upload_path(filename)
+        if has_variants(filename) or not os.path.exists(path):
+            continue
+        process_image(filename, source=path)
+        # 카드 조각 캐시와 페이지 ETag가 새 <img> 마크업(srcset)으로 다시 그려지도록 버전 시각을 올린다
+        now = datetime.utcnow()
+        Post.query.filter(Post.image_filename == filename).update({Post.updated_at: now}, synchronize_session=False)
+        User.query.filter(User.profile_image == filename).update({User.profile_updated_at: now}, synchronize_session=False)
+        db.session.commit()
+        generated += 1
+    print(f'이미지 {generated}개의 변환본을 만들었습니다.')
+
+@bp.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """게시물/댓글 전문 검색 색인을 다시 만듭니다."""
+    total = rebuild_search_index()
+    print(f'검색 색인에 {total}건을 넣었습니다.')
+
+@bp.cli.command('gc-uploads')
+def gc_uploads_command():
+    """참조 수가 0인 업로드 파일과 변환본을 삭제합니다."""
+    removed = collect_garbage()
+    print(f'사용하지 않는 업로드 파일 {len(removed)}개를 삭제했습니다.')
+
+def create_app(config_class=Config):
+    app = Flask(__name__)
+    app.config.from_object(config_class)
+    
+    # 프록시 뒤에서 실행할 때 X-Forwarded-For로 클라이언트 IP를 얻는다 (로그인 시도 제한에 사용)
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'], x_proto=1)
+    
+    db.init_app(app)
+    fragment_cache.init_app(app)
+    identity_cache.init_app(app)
+    metrics.init_app(app)
+    assets.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(bp)
+    return app
+
 if __name__ == '__main__':
+    app = create_app()
+    # 개발 서버는 처음 실행할 때 바로 쓸 수 있도록 준비 작업을 함께 한다
+    with app.app_context():
+        bootstrap()
     app.run(debug=True, host='127.0.0.1', port=5000)
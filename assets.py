@@ -0,0 +1,391 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import current_app, request, send_from_directory, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # 없으면 .br 파일은 만들지 않고 gzip만 쓴다
+    brotli = None
+
+# 정적 파일 빌드 (flask --app app build-assets)
+# static/ 아래 원본을 내용 해시가 붙은 이름(style.3f2a9c0d1e4b.css)으로 ASSET_DIST_DIR에 쓰고,
+# 원본 경로 -> 빌드된 경로를 manifest.json에 기록한다. 템플릿은 asset_url('css/style.css')로 주소를 얻는다.
+# 이름이 내용에 따라 바뀌므로 /assets/ 아래 파일은 1년간 재검증 없이 캐시하고(immutable),
+# 브라우저가 받을 수 있으면 미리 압축해 둔 .br/.gz 파일을 그대로 보낸다.
+
+# CDN에서 쓰던 Bootstrap/Bootstrap Icons를 이 버전 그대로 static/vendor/에 두고 직접 제공한다
+# 파일은 build-assets --refresh-vendor로 한 번 내려받아 static/vendor/SHA256SUMS와 함께 커밋한다.
+# 평소 빌드는 네트워크를 쓰지 않고, 커밋된 해시와 다른 파일이 있으면 실패한다 (CDN의 파일이 바뀌어도 그대로 1년간 캐시되지 않도록).
+VENDOR_FILES = {
+    'vendor/bootstrap/bootstrap.min.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js':
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff':
+        'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/fonts/bootstrap-icons.woff',
+}
+VENDOR_CHECKSUMS = 'vendor/SHA256SUMS'
+
+
+class VendorError(Exception):
+    pass
+
+# 빌드할 파일 (static/ 기준). CSS의 url()을 빌드된 이름으로 바꾸려면 글꼴을 먼저 처리해야 한다.
+ASSETS = [
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff',
+    'vendor/bootstrap/bootstrap.min.css',
+    'vendor/bootstrap-icons/bootstrap-icons.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js',
+    'css/style.css',
+]
+
+# 템플릿/코드에 나오지 않는 클래스의 규칙을 지울 CSS
+PURGE_CSS = {'vendor/bootstrap/bootstrap.min.css', 'vendor/bootstrap-icons/bootstrap-icons.css'}
+
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt'}
+MAX_AGE = 31536000
+
+mimetypes.add_type('font/woff2', '.woff2')
+mimetypes.add_type('font/woff', '.woff')
+
+
+# ===== 제공 =====
+class AssetManifest:
+    def __init__(self):
+        self.dist_dir = None
+        self.entries = {}
+
+    def init_app(self, app):
+        self.dist_dir = app.config['ASSET_DIST_DIR']
+        self.load()
+
+    def load(self):
+        try:
+            with open(os.path.join(self.dist_dir, 'manifest.json'), encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+
+    def url(self, path):
+        built = self.entries.get(path)
+        if built:
+            return url_for('main.asset', filename=built)
+        # 빌드하지 않은 개발 환경: 원본 파일을 쓰고, 아직 내려받지 않은 외부 파일은 CDN 주소를 쓴다
+        if path in VENDOR_FILES and not os.path.exists(os.path.join(current_app.static_folder, path)):
+            return VENDOR_FILES[path]
+        return url_for('static', filename=path)
+
+    def send(self, filename):
+        response = None
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            path = safe_join(self.dist_dir, filename + suffix)
+            if request.accept_encodings[encoding] and path and os.path.isfile(path):
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                response = send_from_directory(self.dist_dir, filename + suffix, mimetype=mimetype, max_age=MAX_AGE)
+                response.content_encoding = encoding
+                break
+        if response is None:
+            response = send_from_directory(self.dist_dir, filename, max_age=MAX_AGE)
+        response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = f'public, max-age={MAX_AGE}, immutable'
+        return response
+
+
+assets = AssetManifest()
+
+
+# ===== 빌드 =====
+def build_assets(refresh_vendor=False, purge=True):
+    static_dir = current_app.static_folder
+    dist_dir = current_app.config['ASSET_DIST_DIR']
+    if refresh_vendor:
+        fetch_vendor(static_dir)
+    # 커밋된 외부 파일이 없으면 빌드에서 빼고, 템플릿은 예전처럼 CDN 주소를 쓴다
+    vendored = verify_vendor(static_dir)
+    sources = [source for source in ASSETS if source not in VENDOR_FILES or source in vendored]
+    if not vendored:
+        print("static/vendor/가 없어 Bootstrap은 CDN에서 제공합니다 (build-assets --refresh-vendor 후 커밋)")
+
+    is_used = used_class_checker(current_app.root_path, static_dir, sources) if purge else None
+    manifest = {}
+    for source in sources:
+        with open(os.path.join(static_dir, source), 'rb') as f:
+            data = f.read()
+        original_size = len(data)
+
+        ext = posixpath.splitext(source)[1]
+        if ext == '.css':
+            css = data.decode('utf-8')
+            if is_used is not None and source in PURGE_CSS:
+                css = purge_css(css, is_used)
+            else:
+                css = strip_comments(css)
+            data = rewrite_urls(css, source, manifest).encode('utf-8')
+        elif ext == '.js':
+            # 소스맵은 내려받지 않으므로 참조를 지운다 (개발자 도구의 404 방지)
+            data = SOURCE_MAP_COMMENT.sub(b'', data)
+
+        built = write_asset(dist_dir, source, data)
+        manifest[source] = built
+        print(f"{source} -> {built} ({original_size} -> {len(data)} bytes)")
+
+    os.makedirs(dist_dir, exist_ok=True)
+    manifest_path = os.path.join(dist_dir, 'manifest.json')
+    with open(manifest_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + '.tmp', manifest_path)
+    assets.load()
+    return manifest
+
+
+def file_sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_checksums(static_dir):
+    # sha256sum 형식 ('<해시>  <static/ 기준 경로>')
+    checksums = {}
+    with open(os.path.join(static_dir, *VENDOR_CHECKSUMS.split('/')), encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                digest, path = line.split(None, 1)
+                checksums[path.strip()] = digest.lower()
+    return checksums
+
+
+def verify_vendor(static_dir):
+    # 커밋된 외부 파일을 SHA256SUMS와 비교한다. 하나라도 없거나 다르면 VendorError, SHA256SUMS가 없으면 빈 집합.
+    try:
+        checksums = read_checksums(static_dir)
+    except FileNotFoundError:
+        return set()
+    for path in VENDOR_FILES:
+        target = os.path.join(static_dir, *path.split('/'))
+        if path not in checksums:
+            raise VendorError(f"{VENDOR_CHECKSUMS}에 {path}의 해시가 없습니다")
+        if not os.path.exists(target):
+            raise VendorError(f"{path}가 없습니다 (build-assets --refresh-vendor)")
+        if file_sha256(target) != checksums[path]:
+            raise VendorError(f"{path}의 SHA-256이 {VENDOR_CHECKSUMS}와 다릅니다")
+    return set(VENDOR_FILES)
+
+
+def fetch_vendor(static_dir):
+    # 모두 내려받은 뒤에 한꺼번에 바꾸고 SHA256SUMS를 새로 쓴다. 바뀐 해시는 커밋할 때 diff로 확인한다.
+    import urllib.request
+    downloaded = {}
+    for path, source_url in VENDOR_FILES.items():
+        print(f"Downloading {source_url}")
+        with urllib.request.urlopen(source_url, timeout=30) as response:
+            downloaded[path] = response.read()
+
+    for path, data in downloaded.items():
+        target = os.path.join(static_dir, *path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(target + '.tmp', target)
+    checksums_path = os.path.join(static_dir, *VENDOR_CHECKSUMS.split('/'))
+    with open(checksums_path + '.tmp', 'w', encoding='utf-8') as f:
+        for path, data in sorted(downloaded.items()):
+            digest = hashlib.sha256(data).hexdigest()
+            f.write(f"{digest}  {path}\n")
+            print(f"{digest}  {path}")
+    os.replace(checksums_path + '.tmp', checksums_path)
+
+
+def write_asset(dist_dir, source, data):
+    # 이전 빌드의 파일은 지우지 않는다 (배포 직전에 받은 페이지가 예전 이름으로 요청할 수 있음)
+    root, ext = posixpath.splitext(source)
+    built = f'{root}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+    path = os.path.join(dist_dir, *built.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        return built
+
+    variants = [('', data)]
+    if ext in COMPRESSIBLE:
+        variants.append(('.gz', gzip.compress(data, compresslevel=9, mtime=0)))
+        if brotli is not None:
+            variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, content in variants:
+        # 압축해도 작아지지 않으면 원본만 보낸다
+        if suffix and len(content) >= len(data):
+            continue
+        with open(path + suffix + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + suffix + '.tmp', path + suffix)
+    return built
+
+
+# ===== CSS =====
+SOURCE_MAP_COMMENT = re.compile(rb'\n?//# sourceMappingURL=\S*\s*$')
+CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+CLASS_NAME = re.compile(r'\.((?:[\w-]|\\.)+)')
+ATTRIBUTE_SELECTOR = re.compile(r'\[[^\]]*\]')
+FUNCTIONAL_PSEUDO = re.compile(r':[\w-]+\((?:[^()]|\([^()]*\))*\)')
+KEYFRAMES = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)')
+WORD = re.compile(r'[\w-]+')
+# class="alert-{{ category }}"처럼 뒷부분이 템플릿에서 정해지는 클래스
+DYNAMIC_CLASS_PREFIX = re.compile(r'([\w-]+-)(?:\{\{|\$\{)')
+# 이 접두사가 붙은 @규칙 안에는 일반 규칙이 들어 있다
+NESTED_AT_RULES = ('@media', '@supports', '@container', '@layer')
+
+
+def used_class_checker(root_path, static_dir, assets_sources=ASSETS):
+    # 템플릿, 파이썬 코드(flash 분류 등), Bootstrap JS(동작 중에 붙이는 show/collapsing 등)에 나오는 단어를 모두 사용 중으로 본다
+    sources = []
+    for directory, _, filenames in os.walk(os.path.join(root_path, 'templates')):
+        sources.extend(os.path.join(directory, name) for name in filenames if name.endswith('.html'))
+    sources.extend(os.path.join(root_path, name) for name in os.listdir(root_path) if name.endswith('.py'))
+    sources.extend(os.path.join(static_dir, source) for source in assets_sources if source.endswith('.js'))
+
+    words, prefixes = set(), set()
+    for path in sources:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            text = f.read()
+        words.update(WORD.findall(text))
+        prefixes.update(DYNAMIC_CLASS_PREFIX.findall(text))
+    prefixes = tuple(prefixes)
+    return lambda name: name in words or name.startswith(prefixes)
+
+
+def skip_string(text, i):
+    quote = text[i]
+    i += 1
+    while i < len(text) and text[i] != quote:
+        i += 2 if text[i] == '\\' else 1
+    return i + 1
+
+
+def strip_comments(css, keep_licenses=True):
+    # 라이선스 주석(/*! ... */)만 남긴다
+    out = []
+    i = start = 0
+    while i < len(css):
+        if css[i] in '"\'':
+            i = skip_string(css, i)
+        elif css.startswith('/*', i):
+            end = css.find('*/', i + 2)
+            end = len(css) if end < 0 else end + 2
+            out.append(css[start:i])
+            if keep_licenses and css.startswith('/*!', i):
+                out.append(css[i:end] + '\n')
+            i = start = end
+        else:
+            i += 1
+    out.append(css[start:])
+    return ''.join(out)
+
+
+def parse_blocks(css):
+    # 최상위 [(머리, 본문)]. 머리는 선택자나 @규칙, 본문은 {} 안쪽 (;로 끝나는 @charset 등은 None)
+    nodes = []
+    depth = start = head_end = 0
+    i = 0
+    while i < len(css):
+        ch = css[i]
+        if ch in '"\'':
+            i = skip_string(css, i)
+            continue
+        if ch == '{':
+            if depth == 0:
+                head_end = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                nodes.append((css[start:head_end].strip(), css[head_end + 1:i]))
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            nodes.append((css[start:i].strip(), None))
+            start = i + 1
+        i += 1
+    return nodes
+
+
+def split_selectors(head):
+    # 쉼표로 나누되 :is(.a,.b)처럼 괄호 안의 쉼표는 무시한다
+    selectors, depth, start = [], 0, 0
+    for i, ch in enumerate(head):
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            selectors.append(head[start:i].strip())
+            start = i + 1
+    selectors.append(head[start:].strip())
+    return selectors
+
+
+def selector_used(selector, is_used):
+    # 선택자에 나오는 클래스가 모두 쓰이고 있어야 한다. :not(.x) 같은 괄호 안과 [속성] 조건은 보지 않는다.
+    bare = ATTRIBUTE_SELECTOR.sub('', FUNCTIONAL_PSEUDO.sub('', selector))
+    return all(is_used(re.sub(r'\\(.)', r'\1', name)) for name in CLASS_NAME.findall(bare))
+
+
+def purge_rules(css, is_used):
+    rules = []
+    for head, body in parse_blocks(css):
+        if body is None:
+            rules.append(head + ';')
+        elif head.startswith('@'):
+            if head.lower().startswith(NESTED_AT_RULES):
+                inner = purge_rules(body, is_used)
+                if inner:
+                    rules.append(head + '{' + ''.join(inner) + '}')
+            else:
+                # @font-face, @keyframes 등은 그대로 둔다
+                rules.append(head + '{' + body.strip() + '}')
+        else:
+            selectors = [selector for selector in split_selectors(head) if selector_used(selector, is_used)]
+            if selectors:
+                rules.append(','.join(selectors) + '{' + body.strip() + '}')
+    return rules
+
+
+def purge_css(css, is_used):
+    licenses = re.findall(r'/\*!.*?\*/', css, re.S)
+    rules = purge_rules(strip_comments(css, keep_licenses=False), is_used)
+
+    # 남은 규칙에서 쓰지 않는 애니메이션도 지운다
+    others = ''.join(rule for rule in rules if not KEYFRAMES.match(rule))
+    rules = [
+        rule for rule in rules
+        if not KEYFRAMES.match(rule) or re.search(r'\b' + re.escape(KEYFRAMES.match(rule).group(1)) + r'\b', others)
+    ]
+    # @charset은 파일 맨 앞에 있어야 한다
+    charset = [rules.pop(0)] if rules and rules[0].startswith('@charset') else []
+    return '\n'.join(charset + licenses + [''.join(rules)])
+
+
+def rewrite_urls(css, source, manifest):
+    # 다른 빌드 파일(글꼴 등)을 가리키는 상대 url()을 빌드된 이름으로 바꾼다. 캐시 무효화용 ?쿼리는 필요 없으므로 뗀다.
+    base = posixpath.dirname(source)
+
+    def replace(match):
+        quote, target = match.groups()
+        if target.startswith(('data:', 'http:', 'https:', '//', '/')):
+            return match.group(0)
+        path, _, fragment = target.partition('#')
+        path = posixpath.normpath(posixpath.join(base, path.split('?', 1)[0]))
+        if path not in manifest:
+            return match.group(0)
+        built = posixpath.relpath(manifest[path], base)
+        return f'url({quote}{built}{"#" + fragment if fragment else ""}{quote})'
+
+    return CSS_URL.sub(replace, css)
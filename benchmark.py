@@ -0,0 +1,499 @@
+#!/usr/bin/env python
+# 주요 라우트 벤치마크
+#
+#   python benchmark.py seed                      # 합성 데이터 생성 (instance/benchmark.db)
+#   python benchmark.py run --save-baseline       # 실행 후 결과를 기준선으로 저장
+#   python benchmark.py run                       # 기준선과 비교 (느려지거나 쿼리 수가 늘면 종료 코드 1)
+#   python benchmark.py run --url http://127.0.0.1:8000   # 실행 중인 gunicorn에 요청 (쿼리 수는 측정하지 않음)
+#
+# 운영/개발 데이터베이스를 건드리지 않도록 --database(기본: instance/benchmark.db)를 DATABASE_URL로 지정한 뒤 앱을 불러온다.
+# --url로 실행할 때는 서버도 같은 데이터베이스를 쓰도록 DATABASE_URL을 맞춰서 띄워야 한다.
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timedelta
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_DATABASE = 'sqlite:///' + os.path.join(basedir, 'instance', 'benchmark.db')
+DEFAULT_BASELINE = os.path.join(basedir, 'instance', 'benchmark_baseline.json')
+
+BENCH_PASSWORD = 'benchmark'
+CATEGORIES = ['공지', '일상', '게임', '영화']
+WORDS = (
+    '오늘 내일 게임 영화 점심 저녁 회의 주말 산책 커피 공부 프로젝트 리뷰 추천 후기 정말 너무 재밌다 '
+    '맛있다 피곤하다 좋아요 다음 같이 보자 lol gg nice build release deploy bug fix'
+).split()
+CHUNK = 5000
+
+
+def load_app(database):
+    os.environ['DATABASE_URL'] = database
+    from app import create_app
+    return create_app()
+
+
+def recent(rng, ids, skew):
+    # 뒤쪽(최근) id일수록 자주 고른다. skew가 클수록 더 치우친다.
+    return ids[min(len(ids) - 1, int(len(ids) * (1 - rng.random() ** skew)))]
+
+
+def sentence(rng, low=3, high=20):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def insert_rows(table, rows):
+    from models import db
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+    db.session.commit()
+
+
+def next_id(model):
+    from models import db
+    return (db.session.query(db.func.max(model.id)).scalar() or 0) + 1
+
+
+# ===== 합성 데이터 =====
+# 같은 --seed면 같은 데이터가 만들어진다 (시각만 실행한 날 기준으로 밀림).
+# ORM 이벤트를 거치지 않고 테이블에 바로 넣은 뒤 카운터와 검색 색인을 한 번에 다시 계산한다.
+def seed(args):
+    app = load_app(args.database)
+    from app import bootstrap
+    from models import db, User, Post, Comment, Notification, post_likes, comment_likes, recount_counters
+    from search import rebuild_search_index
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(args.seed)
+    scale = args.scale
+    counts = {
+        'users': int(args.users * scale),
+        'posts': int(args.posts * scale),
+        'comments': int(args.comments * scale),
+        'post_likes': int(args.likes * scale),
+        'comment_likes': int(args.likes * scale) // 5,
+        'notifications': int(args.notifications * scale),
+    }
+
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        bootstrap()
+        if User.query.filter(User.username.like('bench%')).first():
+            print('벤치마크 데이터가 이미 있습니다. 다시 만들려면 --reset을 주세요.')
+            return
+
+        started = time.perf_counter()
+        end = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        begin = end - timedelta(days=365)
+        span = (end - begin).total_seconds()
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+
+        first_user = next_id(User)
+        user_ids = list(range(first_user, first_user + counts['users']))
+        insert_rows(User.__table__, [{
+            'id': user_id,
+            'username': f'bench{user_id}',
+            'email': f'bench{user_id}@example.com',
+            'password_hash': password_hash,
+            'display_name': f'벤치{user_id}',
+            'bio': sentence(rng),
+            'profile_image': 'default_profile.jpg',
+            'profile_image_status': 'ready',
+            'is_approved': True,
+            'is_admin': False,
+            'created_at': begin,
+        } for user_id in user_ids])
+
+        # 게시물은 id 순서대로 시간이 흐르고, 일부 사용자가 글을 많이 쓰도록 작성자를 치우치게 고른다
+        first_post = next_id(Post)
+        post_ids = list(range(first_post, first_post + counts['posts']))
+        post_times = sorted(begin + timedelta(seconds=rng.random() * span) for _ in post_ids)
+        post_authors = {}
+        rows = []
+        for post_id, created_at in zip(post_ids, post_times):
+            author = user_ids[min(int(rng.paretovariate(1.2)) - 1, len(user_ids) - 1)] \
+                if rng.random() < 0.5 else rng.choice(user_ids)
+            post_authors[post_id] = author
+            rows.append({
+                'id': post_id,
+                'content': sentence(rng),
+                'category': rng.choice(CATEGORIES),
+                'image_status': 'ready',
+                'user_id': author,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        insert_rows(Post.__table__, rows)
+
+        first_comment = next_id(Comment)
+        comment_ids = list(range(first_comment, first_comment + (counts['comments'] if post_ids else 0)))
+        comment_posts = {}
+        rows = []
+        for comment_id in comment_ids:
+            # 최근 게시물에 댓글이 몰리도록 뒤쪽 게시물을 더 자주 고른다
+            post_id = recent(rng, post_ids, 3)
+            comment_posts[comment_id] = post_id
+            created_at = min(end, post_times[post_id - first_post] + timedelta(minutes=rng.randint(1, 3000)))
+            rows.append({
+                'id': comment_id,
+                'content': sentence(rng, 1, 10),
+                'user_id': rng.choice(user_ids),
+                'post_id': post_id,
+                'created_at': created_at,
+                'updated_at': created_at,
+            })
+        insert_rows(Comment.__table__, rows)
+
+        liked_posts = set()
+        while post_ids and len(liked_posts) < min(counts['post_likes'], len(user_ids) * len(post_ids)):
+            liked_posts.add((rng.choice(user_ids), recent(rng, post_ids, 2)))
+        insert_rows(post_likes, [{'user_id': u, 'post_id': p} for u, p in liked_posts])
+
+        liked_comments = set()
+        while comment_posts and len(liked_comments) < min(counts['comment_likes'], len(user_ids) * len(comment_posts)):
+            liked_comments.add((rng.choice(user_ids), rng.choice(comment_ids)))
+        insert_rows(comment_likes, [{'user_id': u, 'comment_id': c} for u, c in liked_comments])
+
+        rows = []
+        for _ in range(counts['notifications'] if post_ids else 0):
+            post_id = rng.choice(post_ids)
+            kind = rng.choice(['like', 'comment'])
+            created_at = begin + timedelta(seconds=rng.random() * span)
+            rows.append({
+                'user_id': post_authors[post_id],
+                'type': kind,
+                'related_user_id': rng.choice(user_ids),
+                'related_post_id': post_id,
+                'actor_count': rng.randint(1, 5) if kind == 'like' else 1,
+                'is_read': rng.random() < 0.8,
+                'created_at': created_at,
+            })
+        insert_rows(Notification.__table__, rows)
+
+        recount_counters()
+        indexed = rebuild_search_index()
+        for name, count in counts.items():
+            print(f'{name}: {count}')
+        print(f'검색 색인: {indexed}건')
+        print(f'완료 ({time.perf_counter() - started:.1f}초)')
+
+
+# ===== 클라이언트 =====
+CSRF_TOKEN = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"')
+
+
+class LocalClient:
+    # Flask 테스트 클라이언트. 요청을 처리한 스레드에서 실행된 SQL 문 수를 함께 센다.
+    def __init__(self, app, counter):
+        self.client = app.test_client()
+        self.counter = counter
+
+    def request(self, method, path, data=None):
+        self.counter.queries = 0
+        response = self.client.open(path, method=method, data=data)
+        return response.status_code, response.get_data(as_text=True), self.counter.queries
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    # 실행 중인 서버에 HTTP로 요청한다 (쿠키 유지, 리다이렉트는 따라가지 않음)
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect
+        )
+
+    def request(self, method, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + path, data=body, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read().decode('utf-8', 'replace'), None
+        except urllib.error.HTTPError as e:
+            return e.code, e.read().decode('utf-8', 'replace'), None
+
+
+class Session:
+    # 벤치마크 사용자 한 명으로 로그인한 클라이언트
+    def __init__(self, client, username):
+        self.client = client
+        status, body, _ = client.request('GET', '/login')
+        self.csrf_token = csrf_token(body)
+        status, _, _ = client.request('POST', '/login', {
+            'csrf_token': self.csrf_token, 'username': username, 'password': BENCH_PASSWORD
+        })
+        if status != 302:
+            raise RuntimeError(f'{username} 로그인 실패 (status {status})')
+        # 로그인하면 세션이 바뀌므로 폼 제출용 토큰을 다시 받는다
+        _, body, _ = client.request('GET', '/profile/edit')
+        self.csrf_token = csrf_token(body)
+
+
+def csrf_token(body):
+    match = CSRF_TOKEN.search(body)
+    return match.group(1) if match else ''
+
+
+# ===== 시나리오 =====
+# 각 함수는 (method, path, data)를 돌려준다. 대상 게시물/사용자는 데이터 범위에서 무작위로 고른다.
+def scenario_feed(rng, data, session):
+    category = rng.choice([None, None, None] + CATEGORIES)
+    return 'GET', '/feed' + (f'?category={urllib.parse.quote(category)}' if category else ''), None
+
+
+def scenario_view_post(rng, data, session):
+    return 'GET', f"/post/{rng.choice(data['recent_posts'])}", None
+
+
+def scenario_view_profile(rng, data, session):
+    return 'GET', f"/profile/{rng.choice(data['users'])}", None
+
+
+def scenario_like_post(rng, data, session):
+    return rng.choice(['PUT', 'DELETE']), f"/post/{rng.choice(data['recent_posts'])}/like", None
+
+
+def scenario_add_comment(rng, data, session):
+    return 'POST', f"/post/{rng.choice(data['recent_posts'])}/comment/add", {
+        'csrf_token': session.csrf_token, 'content': sentence(rng, 1, 10)
+    }
+
+
+def scenario_notifications(rng, data, session):
+    return 'GET', '/notifications', None
+
+
+def scenario_unread_count(rng, data, session):
+    return 'GET', '/api/notifications/unread-count', None
+
+
+SCENARIOS = {
+    'feed': scenario_feed,
+    'view_post': scenario_view_post,
+    'view_profile': scenario_view_profile,
+    'like_post': scenario_like_post,
+    'add_comment': scenario_add_comment,
+    'notifications': scenario_notifications,
+    'unread_count': scenario_unread_count,
+}
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+
+def run_scenario(name, sessions, data, requests, warmup, seed):
+    make_request = SCENARIOS[name]
+    latencies = []
+    queries = []
+    errors = []
+    lock = threading.Lock()
+
+    def phase(total, record):
+        remaining = [total]
+
+        def worker(index, session):
+            rng = random.Random(f'{seed}:{name}:{record}:{index}')
+            while True:
+                with lock:
+                    if remaining[0] <= 0:
+                        return
+                    remaining[0] -= 1
+                method, path, form = make_request(rng, data, session)
+                started = time.perf_counter()
+                status, _, count = session.client.request(method, path, form)
+                elapsed = time.perf_counter() - started
+                if not record:
+                    continue
+                with lock:
+                    latencies.append(elapsed * 1000)
+                    if count is not None:
+                        queries.append(count)
+                    if status >= 400:
+                        errors.append(f'{method} {path} -> {status}')
+
+        threads = [threading.Thread(target=worker, args=(i, session)) for i, session in enumerate(sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    # 준비 요청(캐시/연결 풀 채우기)은 따로 보내고 측정하지 않는다
+    phase(warmup, record=False)
+    wall = phase(requests, record=True)
+
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p90_ms': round(percentile(latencies, 90), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(max(latencies), 2) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else None,
+        'queries_max': max(queries) if queries else None,
+    }
+
+
+def sample_data(app, limit=2000):
+    # 시나리오가 고를 게시물/사용자 id (최근 게시물 위주) 와 로그인할 사용자 이름
+    from models import db, User, Post
+    with app.app_context():
+        users = [user_id for (user_id,) in db.session.query(User.id).filter(User.username.like('bench%')).limit(limit)]
+        posts = [post_id for (post_id,) in db.session.query(Post.id).order_by(Post.id.desc()).limit(limit)]
+        names = [name for (name,) in db.session.query(User.username).filter(User.id.in_(users[:64]))]
+    if not users or not posts:
+        raise SystemExit('벤치마크 데이터가 없습니다. 먼저 python benchmark.py seed를 실행하세요.')
+    return {'users': users, 'recent_posts': posts, 'usernames': names}
+
+
+def run(args):
+    app = load_app(args.database)
+    data = sample_data(app)
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        from sqlalchemy import event
+        from models import db
+        counter = threading.local()
+        with app.app_context():
+            engine = db.engine
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_query(*_):
+            counter.queries = getattr(counter, 'queries', 0) + 1
+
+        make_client = lambda: LocalClient(app, counter)
+
+    sessions = [Session(make_client(), data['usernames'][i % len(data['usernames'])]) for i in range(args.concurrency)]
+    names = args.scenarios or list(SCENARIOS)
+    results = {
+        'meta': {
+            'target': args.url or 'test-client',
+            'database': args.database if not args.url else None,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'at': datetime.utcnow().isoformat(timespec='seconds'),
+        },
+        'scenarios': {},
+    }
+    for name in names:
+        results['scenarios'][name] = run_scenario(name, sessions, data, args.requests, args.warmup, args.seed)
+        print_result(name, results['scenarios'][name])
+
+    if args.output:
+        write_json(args.output, results)
+
+    if args.save_baseline:
+        write_json(args.baseline, results)
+        print(f'기준선을 저장했습니다: {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'기준선이 없습니다 ({args.baseline}). --save-baseline으로 먼저 저장하세요.')
+        return 0
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('target') != results['meta']['target']:
+        print(f"주의: 기준선은 {baseline.get('meta', {}).get('target')}에서 측정했습니다.")
+    regressions = compare(baseline, results, args.tolerance)
+    if regressions:
+        print('\n성능 저하:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print('\n기준선 대비 성능 저하 없음')
+    return 0
+
+
+def print_result(name, result):
+    queries = f"{result['queries_mean']:>6} (max {result['queries_max']})" if result['queries_mean'] is not None else '     -'
+    print(
+        f"{name:<14} n={result['requests']:<5} err={result['errors']:<3} "
+        f"p50={result['p50_ms']:>8.2f}ms p90={result['p90_ms']:>8.2f}ms p99={result['p99_ms']:>8.2f}ms "
+        f"{result['throughput_rps']:>8.1f} req/s  queries={queries}"
+    )
+    for sample in result['error_samples']:
+        print(f'    {sample}')
+
+
+def compare(baseline, results, tolerance):
+    # 중앙값 지연이 허용 비율보다 늘었거나, 요청당 평균 쿼리 수가 늘었거나, 오류가 생긴 시나리오
+    # (p90/p99는 동시 요청 수와 디스크 상태에 따라 흔들리므로 표시만 한다)
+    regressions = []
+    for name, result in results['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        if base['p50_ms'] and result['p50_ms'] > base['p50_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {base['p50_ms']}ms -> {result['p50_ms']}ms")
+        if base.get('queries_mean') is not None and result['queries_mean'] is not None \
+                and result['queries_mean'] > base['queries_mean'] + 0.5:
+            regressions.append(f"{name}: 요청당 쿼리 {base['queries_mean']} -> {result['queries_mean']}")
+        if result['errors'] > base.get('errors', 0):
+            regressions.append(f"{name}: 오류 {base.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+def write_json(path, value):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(value, f, ensure_ascii=False, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='공겜SNS 주요 라우트 벤치마크')
+    parser.add_argument('--database', default=os.environ.get('BENCHMARK_DATABASE_URL', DEFAULT_DATABASE),
+                        help='벤치마크용 데이터베이스 URL (기본: instance/benchmark.db)')
+    parser.add_argument('--seed', type=int, default=42, help='난수 시드 (같은 값이면 같은 데이터/요청 순서)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help='합성 데이터 생성')
+    seed_parser.add_argument('--users', type=int, default=2000)
+    seed_parser.add_argument('--posts', type=int, default=200000)
+    seed_parser.add_argument('--comments', type=int, default=400000)
+    seed_parser.add_argument('--likes', type=int, default=1000000, help='게시물 좋아요 수 (댓글 좋아요는 1/5)')
+    seed_parser.add_argument('--notifications', type=int, default=200000)
+    seed_parser.add_argument('--scale', type=float, default=1.0, help='모든 수에 곱할 비율 (빠른 확인용: 0.01)')
+    seed_parser.add_argument('--reset', action='store_true', help='기존 테이블을 지우고 새로 만든다')
+
+    run_parser = commands.add_parser('run', help='시나리오 실행/기준선 비교')
+    run_parser.add_argument('--url', help='실행 중인 서버 주소 (없으면 Flask 테스트 클라이언트)')
+    run_parser.add_argument('--requests', type=int, default=200, help='시나리오별 측정 요청 수')
+    run_parser.add_argument('--warmup', type=int, default=20, help='시나리오별 준비 요청 수 (측정 제외)')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='동시에 요청하는 사용자 수')
+    run_parser.add_argument('--scenarios', nargs='*', choices=list(SCENARIOS))
+    run_parser.add_argument('--output', help='결과 JSON 파일')
+    run_parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    run_parser.add_argument('--save-baseline', action='store_true')
+    run_parser.add_argument('--tolerance', type=float, default=0.25, help='중앙값 지연 허용 증가 비율')
+
+    args = parser.parse_args(argv)
+    if args.command == 'seed':
+        seed(args)
+        return 0
+    return run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,34 +5,8 @@ set -o errexit
 pip install --upgrade pip
 pip install -r requirements.txt
 
-# 2. 데이터베이스 디렉토리 및 업로드 폴더 생성
-mkdir -p instance static/uploads
+# 2. 폴더/기본 이미지/데이터베이스 스키마/관리자 계정 준비 (기존 데이터 보존, 마이그레이션 포함)
+flask --app app bootstrap
 
-# 3. 기본 이미지 생성
-python create_default_image.py
-
-# 4. 데이터베이스 초기화 (기존 데이터 보존)
-python -c "
-from app import app, db
-from models import User
-
-with app.app_context():
-    db.create_all()
-    
-    # 관리자 계정이 없으면 생성
-    admin = User.query.filter_by(username='admin').first()
-    if not admin:
-        admin = User(
-            username='admin',
-            email='admin@ggame.com',
-            display_name='관리자',
-            is_admin=True,
-            is_approved=True
-        )
-        admin.set_password('admin123')
-        db.session.add(admin)
-        db.session.commit()
-        print('관리자 계정이 생성되었습니다.')
-    else:
-        print('관리자 계정이 이미 존재합니다.')
-"
+# 3. 정적 파일 빌드 (커밋된 Bootstrap 파일 해시 확인, 쓰지 않는 CSS 제거, 해시 이름, 압축본)
+flask --app app build-assets
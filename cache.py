@@ -0,0 +1,174 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+
+# 보는 사람과 무관한 게시물 카드 조각(작성자/카테고리/시간/본문/이미지)을 렌더링 결과 그대로 저장한다.
+# 항목은 (버전, HTML)로 저장하고, 버전이 다르면 없는 것으로 본다.
+# 버전은 게시물 수정 시각/이미지 상태와 작성자의 프로필 수정 시각/이미지 상태로 만든다 (loaders.PostCard 참고).
+# 여기에 템플릿과 템플릿 함수(앱 코드)의 해시를 붙여, 배포로 카드 마크업이 바뀌면 'local' 캐시에 남은 예전 조각도 쓰지 않는다.
+# 좋아요 여부/개수, 삭제 버튼처럼 보는 사람이나 카운터에 따라 달라지는 부분은 캐시하지 않고 요청마다 그린다.
+class MemoryCache:
+    def __init__(self, max_entries=2000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class LocalFileCache:
+    # 같은 서버의 여러 gunicorn 워커가 함께 쓰는 파일 캐시. 최근 항목은 워커 메모리에도 둔다.
+    # 파일 수가 max_entries를 넘으면 가끔 오래 전에 쓴 파일부터 지운다.
+    PRUNE_INTERVAL = 256
+
+    def __init__(self, directory, max_entries=2000):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.memory = MemoryCache(max_entries)
+        self._writes = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            return value
+        try:
+            with open(self._path(key), encoding='utf-8', newline='') as f:
+                version, html = f.read().split('\n', 1)
+        except (OSError, ValueError):
+            return None
+        value = (version, html)
+        self.memory.set(key, value)
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+                f.write(f"{value[0]}\n{value[1]}")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing fragment cache: {e}")
+            return
+
+        self._writes += 1
+        if self._writes % self.PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def delete(self, key):
+        self.memory.delete(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def prune(self):
+        paths = []
+        for root, _, files in os.walk(self.directory):
+            paths.extend(os.path.join(root, name) for name in files)
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        for path in paths[:len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        self.memory.clear()
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                os.remove(os.path.join(root, name))
+
+
+def source_stamp(root_path, template_folder):
+    # 같은 코드로 시작한 워커는 같은 값을 얻는다 (시작 시각을 쓰면 'local' 캐시를 워커끼리 서로 덮어씀)
+    paths = [os.path.join(root_path, name) for name in os.listdir(root_path) if name.endswith('.py')]
+    for directory, _, files in os.walk(os.path.join(root_path, template_folder)):
+        paths.extend(os.path.join(directory, name) for name in files)
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        digest.update(os.path.relpath(path, root_path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class FragmentCache:
+    def __init__(self):
+        self.backend = None
+        self.stamp = ''
+        self._names = set()
+
+    def init_app(self, app):
+        self.stamp = source_stamp(app.root_path, app.template_folder)
+        # FRAGMENT_CACHE: 'memory'(워커별 LRU), 'local'(같은 서버의 워커가 공유하는 파일), 'none'
+        kind = app.config['FRAGMENT_CACHE']
+        size = app.config['FRAGMENT_CACHE_SIZE']
+        if kind == 'memory':
+            self.backend = MemoryCache(size)
+        elif kind == 'local':
+            self.backend = LocalFileCache(app.config['FRAGMENT_CACHE_DIR'], size)
+        else:
+            self.backend = None
+
+    def render(self, name, post_id, version, render):
+        if self.backend is None:
+            return render()
+
+        self._names.add(name)
+        key = f"post:{post_id}:{name}"
+        version = f"{self.stamp}|{version}"
+        cached = self.backend.get(key)
+        if cached is not None and cached[0] == version:
+            return Markup(cached[1])
+
+        html = str(render())
+        self.backend.set(key, (version, html))
+        return Markup(html)
+
+    def invalidate_post(self, post_id):
+        # 삭제된 게시물의 조각은 다시 쓰이지 않지만, 메모리를 바로 돌려받기 위해 지운다
+        if self.backend is None:
+            return
+        for name in list(self._names):
+            self.backend.delete(f"post:{post_id}:{name}")
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+
+fragment_cache = FragmentCache()
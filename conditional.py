@@ -0,0 +1,77 @@
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, request, session, make_response
+from flask_login import current_user
+
+# 피드/프로필/게시물 페이지의 조건부 GET (ETag, Last-Modified)
+# 라우트마다 페이지 내용을 결정하는 값(게시물 수정 시각, 카운터, 내 좋아요 여부 등)을 좁은 쿼리로 읽어 ETag를 만들고,
+# 브라우저가 보낸 If-None-Match와 같으면 무거운 쿼리와 템플릿 렌더링 없이 304를 돌려준다.
+# 좋아요/댓글 카운터는 수정 시각을 바꾸지 않으므로 Last-Modified는 참고용이고 판단은 ETag로만 한다
+# (브라우저는 둘 다 보내며, 이때 If-None-Match가 우선한다).
+
+# 배포(재시작)하면 템플릿이 바뀌었을 수 있으므로 ETag도 달라지게 한다
+STARTED_AT = repr(time.time())
+
+
+def page_etag(parts):
+    # 같은 페이지라도 보는 사람, 세션의 CSRF 토큰, 폼 토큰 유효 시간 구간이 다르면 다른 ETag
+    # (304로 재사용한 페이지의 폼 토큰이 만료되지 않도록 유효 시간의 절반마다 새로 그린다)
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    token_window = int(time.time() // (time_limit / 2)) if time_limit else 0
+    key = repr((
+        STARTED_AT, request.full_path, current_user.id, current_user.is_admin,
+        session.get('csrf_token'), token_window, parts
+    ))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def latest_time(parts):
+    # 버전 값에 들어 있는 시각 중 가장 최근 것
+    latest = None
+    stack = [parts]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, datetime):
+            if latest is None or value > latest:
+                latest = value
+        elif isinstance(value, (tuple, list)):
+            stack.extend(value)
+    return latest
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # 브라우저만 저장하고 쓸 때마다 재검증한다
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(version):
+    # version(**view_args)는 페이지 내용을 결정하는 값을 돌려준다 (None이면 조건부 처리 없이 그린다)
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # 표시할 플래시 메시지가 있으면 한 번만 보여야 하므로 캐시하지 않는다
+            if not current_app.config['PAGE_ETAGS'] or '_flashes' in session:
+                return f(*args, **kwargs)
+            parts = version(*args, **kwargs)
+            if parts is None:
+                return f(*args, **kwargs)
+
+            etag = page_etag(parts)
+            last_modified = latest_time(parts)
+            if request.if_none_match.contains_weak(etag):
+                return set_validators(current_app.response_class(status=304), etag, last_modified)
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and '_flashes' not in session:
+                set_validators(response, etag, last_modified)
+            return response
+        return decorated_function
+    return decorator
@@ -1,20 +1,129 @@
 import os
+import sqlite3
 from datetime import timedelta
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def database_url():
+    url = os.environ.get('DATABASE_URL')
+    # Render/Heroku가 주는 postgres:// 형식은 SQLAlchemy가 인식하지 못한다
+    if url and url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def engine_options(uri):
+    # gunicorn 스레드 수(render.yaml)보다 연결이 모자라 요청이 풀에서 기다리지 않도록 풀 크기를 맞춘다
+    pool = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+    if uri.startswith('sqlite'):
+        # 메모리 데이터베이스는 연결 하나를 공유하는 풀을 쓰므로 풀 설정을 주지 않는다
+        if uri in ('sqlite://', 'sqlite:///:memory:'):
+            return {}
+        # 잠금 대기는 busy_timeout pragma가 맡고, 드라이버 timeout도 같은 값으로 맞춘다
+        return dict(pool, connect_args={'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000})
+    # 서버 데이터베이스: 끊어진 연결을 쓰기 전에 확인하고, 서버/프록시의 유휴 연결 종료보다 먼저 재연결한다
+    return dict(pool, pool_pre_ping=True, pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)))
+
+
+# ===== SQLite 연결 설정 =====
+# 연결될 때마다 적용한다. WAL 모드에서는 읽기와 쓰기가 서로를 막지 않고, 쓰기끼리는 busy_timeout 동안 기다린다.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',  # WAL에서는 커밋마다 fsync하지 않아도 손상되지 않는다 (전원 장애 시 마지막 커밋만 잃을 수 있음)
+    'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+    'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64000)),  # 음수는 KiB 단위
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'temp_store': 'MEMORY',
+}
+
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+    cursor.close()
+
+
 class Config:
     # 앱 설정
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
     
     # 데이터베이스 설정
     basedir = os.path.abspath(os.path.dirname(__file__))
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
+    SQLALCHEMY_DATABASE_URI = database_url() or \
         'sqlite:///' + os.path.join(basedir, 'instance', 'team_sns.db')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # 파일 업로드 설정
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'static/uploads')
+    # 처리 전 원본(EXIF 포함)은 /uploads로 제공되지 않도록 업로드 폴더 밖에 둔다
+    RAW_UPLOAD_FOLDER = os.path.join(basedir, 'instance', 'raw_uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    IMAGE_PROCESSING_ASYNC = os.environ.get('IMAGE_PROCESSING_ASYNC', '1') == '1'  # 업로드 이미지 백그라운드 처리
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))  # 이미지 처리 스레드 수
+    
+    # 알림 설정
+    NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))  # 읽은 알림 보관 기간
+    NOTIFICATION_ASYNC = os.environ.get('NOTIFICATION_ASYNC', '1') == '1'  # 알림을 요청 밖에서 묶어서 저장
+    NOTIFICATION_COALESCE_WINDOW = int(os.environ.get('NOTIFICATION_COALESCE_WINDOW', 6 * 3600))  # 같은 대상 알림을 합치는 시간(초)
+    NOTIFICATION_STREAM_ENABLED = os.environ.get('NOTIFICATION_STREAM_ENABLED', '1') == '1'  # SSE 알림 스트림
+    NOTIFICATION_STREAM_TIMEOUT = 300  # 스트림 하나를 유지하는 최대 시간(초), 이후 브라우저가 재연결
+    # 워커당 동시에 열어 둘 스트림 수. 스트림 하나가 gthread 스레드 하나를 차지하므로 --threads보다 충분히 작게 둔다.
+    NOTIFICATION_MAX_STREAMS = int(os.environ.get('NOTIFICATION_MAX_STREAMS', 16))
+    NOTIFICATION_STREAM_HEARTBEAT = 20  # 연결 유지용 주석 이벤트 간격(초)
+    
+    # 게시물 카드 조각 캐시 ('memory', 'local'(워커 간 공유 파일), 'none')
+    FRAGMENT_CACHE = os.environ.get('FRAGMENT_CACHE', 'memory')
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 2000))  # 최대 항목 수
+    FRAGMENT_CACHE_DIR = os.path.join(basedir, 'instance', 'fragment_cache')
+    
+    # 빌드된 정적 파일 (flask --app app build-assets, assets.py)
+    ASSET_DIST_DIR = os.path.join(basedir, 'static', 'dist')
+    
+    # 사용자 관리
+    USER_PURGE_ASYNC = os.environ.get('USER_PURGE_ASYNC', '1') == '1'  # 거절된 사용자의 글/댓글/이미지를 백그라운드에서 정리
+    
+    # 비밀번호 해시 (security.py). 방식을 바꾸면 기존 사용자는 다음 로그인 때 새 방식으로 다시 저장된다.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')  # 'scrypt' 등 werkzeug 형식
+    PASSWORD_SALT_LENGTH = 16
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # 해시 계산 스레드 수 (동시에 쓰는 코어 수)
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 8))  # 계산 중인 것 외에 기다릴 수 있는 요청 수
+    PASSWORD_HASH_WAIT = float(os.environ.get('PASSWORD_HASH_WAIT', 5))  # 대기열 자리를 기다리는 최대 시간(초), 넘으면 503
+    
+    # 로그인 시도 제한 (워커별)
+    LOGIN_ATTEMPT_WINDOW = int(os.environ.get('LOGIN_ATTEMPT_WINDOW', 900))  # 시도를 세는 기간(초)
+    LOGIN_MAX_ATTEMPTS_PER_USERNAME = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_USERNAME', 5))
+    LOGIN_MAX_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_IP', 30))
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))  # 앞단 프록시 수 (Render 등에서는 1)
+    
+    # 피드/프로필/게시물 페이지 조건부 GET (conditional.py). 바뀐 것이 없으면 304로 응답한다.
+    PAGE_ETAGS = os.environ.get('PAGE_ETAGS', '1') == '1'
+    
+    # 로그인 사용자 정보 캐시 (워커별, 초). 0이면 요청마다 읽는다.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 30))
+    
+    # 계측 (metrics.py, /admin/metrics)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')  # 로그인 없이 스크랩할 때 쓰는 Bearer 토큰
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 100))  # 이보다 오래 걸린 SQL은 정규화해서 로그/집계
+    # 느린 요청 샘플링 프로파일러 (기본 꺼짐, METRICS_ENABLED도 켜져 있어야 함)
+    PROFILE_SLOW_REQUESTS = os.environ.get('PROFILE_SLOW_REQUESTS', '0') == '1'
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.1))  # 프로파일링할 요청 비율
+    PROFILE_INTERVAL_MS = int(os.environ.get('PROFILE_INTERVAL_MS', 5))  # 스택 샘플링 간격
+    PROFILE_SLOW_MS = int(os.environ.get('PROFILE_SLOW_MS', 500))  # 이보다 오래 걸린 요청만 저장
+    PROFILE_DIR = os.path.join(basedir, 'instance', 'profiles')
     
     # 세션 설정
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
@@ -1,17 +1,25 @@
-from PIL import Image, ImageDraw
 import os
 
-# static/uploads 폴더 생성
-uploads_dir = os.path.join(os.path.dirname(__file__), 'static/uploads')
-os.makedirs(uploads_dir, exist_ok=True)
 
-# 기본 프로필 이미지 생성
-img = Image.new('RGB', (200, 200), color='#e9ecef')
-draw = ImageDraw.Draw(img)
+def create_default_image(uploads_dir=None):
+    # Pillow는 이 함수를 실행할 때만 불러온다 (앱 시작 시간/메모리 절약)
+    from PIL import Image, ImageDraw
 
-# 원 그리기
-draw.ellipse([25, 25, 175, 175], fill='#dee2e6', outline='#adb5bd', width=3)
+    # static/uploads 폴더 생성
+    uploads_dir = uploads_dir or os.path.join(os.path.dirname(__file__), 'static/uploads')
+    os.makedirs(uploads_dir, exist_ok=True)
 
-# 저장
-img.save(os.path.join(uploads_dir, 'default_profile.jpg'))
-print("기본 프로필 이미지가 생성되었습니다.")
+    # 기본 프로필 이미지 생성
+    img = Image.new('RGB', (200, 200), color='#e9ecef')
+    draw = ImageDraw.Draw(img)
+
+    # 원 그리기
+    draw.ellipse([25, 25, 175, 175], fill='#dee2e6', outline='#adb5bd', width=3)
+
+    # 저장
+    img.save(os.path.join(uploads_dir, 'default_profile.jpg'))
+    print("기본 프로필 이미지가 생성되었습니다.")
+
+
+if __name__ == '__main__':
+    create_default_image()
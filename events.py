@@ -0,0 +1,118 @@
+import json
+import queue
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import Notification
+
+
+# 프로세스 안에서 사용자별 SSE 구독자에게 이벤트를 나눠주는 브로커
+# gunicorn 워커마다 하나씩 존재하므로, 스트림과 알림 생성이 같은 워커에서 일어나야 전달된다 (render.yaml은 워커 1개 + 스레드 구성)
+# 열린 스트림 하나는 응답이 끝날 때까지 gthread 스레드 하나를 차지하므로 동시 스트림 수는 NOTIFICATION_MAX_STREAMS로 제한한다.
+class NotificationBroker:
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, payload):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # 읽지 못하는 느린 클라이언트 때문에 요청 스레드가 막히지 않도록 버린다
+                pass
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+broker = NotificationBroker()
+
+
+# ===== 커밋된 알림을 브로커로 전달 =====
+# 알림 작성기(notifications.py)가 flush할 때 새 Notification 행을 기록해 두었다가 커밋이 성공하면 발행한다.
+# 기존 알림에 합쳐진 경우는 미읽음 개수가 바뀌지 않으므로 발행하지 않는다.
+# 읽음 처리처럼 미읽음 개수만 바뀐 경우는 queue_unread_update로 기록해 두면 커밋 후 다른 탭의 배지도 갱신된다.
+# 브로커에는 (이벤트 이름, 데이터)를 넣는다.
+@event.listens_for(Session, 'after_flush')
+def _collect_notifications(session, flush_context):
+    pending = [
+        {
+            'id': obj.id,
+            'user_id': obj.user_id,
+            'type': obj.type,
+            'related_user_id': obj.related_user_id,
+            'related_post_id': obj.related_post_id,
+            'related_comment_id': obj.related_comment_id,
+            'actor_count': obj.actor_count,
+        }
+        for obj in session.new if isinstance(obj, Notification)
+    ]
+    if pending:
+        session.info.setdefault('pending_notifications', []).extend(pending)
+
+
+def queue_unread_update(session, user_id):
+    session.info.setdefault('pending_unread', set()).add(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_notifications(session):
+    for payload in session.info.pop('pending_notifications', []):
+        broker.publish(payload['user_id'], ('notification', payload))
+    for user_id in session.info.pop('pending_unread', ()):
+        broker.publish(user_id, ('unread', None))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notifications(session):
+    session.info.pop('pending_notifications', None)
+    session.info.pop('pending_unread', None)
+
+
+# ===== SSE 스트림 =====
+def format_event(name, data):
+    return f'event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def notification_stream(user_id, unread_count, timeout=300, heartbeat=20):
+    # unread_count는 현재 미읽음 개수를 돌려주는 함수. 접속 직후와 새 알림/읽음 처리가 있을 때만 호출된다.
+    # timeout이 지나면 스트림을 닫고 브라우저의 EventSource가 다시 연결하게 해서 워커 스레드를 오래 붙잡지 않는다.
+    subscriber = broker.subscribe(user_id)
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_event('unread', {'count': unread_count()})
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                name, payload = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            if name == 'notification':
+                yield format_event('notification', payload)
+            yield format_event('unread', {'count': unread_count()})
+    finally:
+        broker.unsubscribe(user_id, subscriber)
@@ -0,0 +1,79 @@
+import time
+
+from flask_login import UserMixin
+
+from cache import MemoryCache
+from models import db, User
+
+# 요청마다 user_loader가 읽는 컬럼 (인증/권한 확인과 내비게이션 바에 필요한 것만)
+IDENTITY_COLUMNS = (
+    User.id, User.username, User.display_name, User.is_admin, User.is_approved,
+    User.profile_image, User.profile_image_status, User.profile_updated_at,
+)
+
+
+# current_user로 쓰는 가벼운 사용자.
+# 위 컬럼 외의 속성(email, bio, unread_notifications_count 등)을 읽으면 그때 User 행을 한 번 불러온다.
+# 좋아요 관련 메서드는 id만 쓰므로 User의 것을 그대로 빌려 쓴다 (행을 불러오지 않음).
+# 값을 바꿀 때는 row(User 객체)에 쓰고, 커밋한 뒤 identity_cache.invalidate()를 호출한다.
+class SessionUser(UserMixin):
+    like_post = User.like_post
+    unlike_post = User.unlike_post
+    has_liked_post = User.has_liked_post
+    liked_post_ids = User.liked_post_ids
+    like_comment = User.like_comment
+    unlike_comment = User.unlike_comment
+    has_liked_comment = User.has_liked_comment
+    liked_comment_ids = User.liked_comment_ids
+
+    def __init__(self, fields):
+        self.__dict__.update(fields)
+        self._row = None
+
+    @property
+    def row(self):
+        if self._row is None:
+            self._row = db.session.get(User, self.id)
+        return self._row
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.row, name)
+
+
+class IdentityCache:
+    # 워커별로 사용자 정보를 USER_CACHE_TTL초 동안 기억한다 (0이면 매 요청 읽음).
+    # 같은 워커에서는 승인/거절/프로필 수정 즉시 무효화되고, 다른 워커에는 TTL 안에 반영된다.
+    def __init__(self):
+        self.ttl = 0
+        self._entries = MemoryCache(5000)
+
+    def init_app(self, app):
+        self.ttl = app.config['USER_CACHE_TTL']
+
+    def load(self, user_id):
+        if self.ttl > 0:
+            cached = self._entries.get(user_id)
+            if cached is not None and cached[0] > time.monotonic():
+                return SessionUser(cached[1])
+
+        # 거절된(비활성) 사용자는 세션이 남아 있어도 로그아웃된 것으로 본다
+        row = db.session.execute(
+            db.select(*IDENTITY_COLUMNS).where(User.id == user_id, User.is_active == True)
+        ).first()
+        if row is None:
+            return None
+        fields = row._asdict()
+        if self.ttl > 0:
+            self._entries.set(user_id, (time.monotonic() + self.ttl, fields))
+        return SessionUser(fields)
+
+    def invalidate(self, user_id):
+        self._entries.delete(user_id)
+
+    def clear(self):
+        self._entries.clear()
+
+
+identity_cache = IdentityCache()
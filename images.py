@@ -0,0 +1,291 @@
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+from models import db, User, Post
+from metrics import observe_duration
+import storage
+
+# 업로드 이미지 처리 상태
+IMAGE_PENDING = 'pending'
+IMAGE_READY = 'ready'
+IMAGE_FAILED = 'failed'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # 워커 프로세스마다 처음 업로드가 들어올 때 스레드 풀을 만든다
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config['IMAGE_WORKERS'],
+                thread_name_prefix='image-worker'
+            )
+        return _executor
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
+
+
+def raw_path(filename):
+    return os.path.join(current_app.config['RAW_UPLOAD_FOLDER'], filename)
+
+
+def move_legacy_raw():
+    # 예전에는 처리 전 원본을 업로드 폴더의 raw/에 두어 /uploads로 그대로 제공되었다. 남아 있는 파일을 옮긴다.
+    legacy = storage.upload_path('raw')
+    if not os.path.isdir(legacy):
+        return
+    for root, _, files in os.walk(legacy):
+        for name in files:
+            source = os.path.join(root, name)
+            target = raw_path(os.path.relpath(source, legacy))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+    shutil.rmtree(legacy)
+
+
+# Pillow는 이미지를 실제로 다룰 때 불러온다 (앱을 불러오는 모든 워커/명령이 내려받지 않도록)
+def save_image(file):
+    # 요청 스레드에서는 원본을 해시 이름으로 저장하고 헤더만 확인한다. 디코딩/리사이즈/인코딩은 process_image가 맡는다.
+    # 원본은 참조를 잡고 커밋한 뒤 finish_upload가 정리한다 (그 사이 같은 파일이 지워지면 다시 만들 수 있도록).
+    from PIL import Image
+    if not file or not allowed_file(file.filename):
+        return None
+
+    started = time.perf_counter()
+    ext = file.filename.rsplit('.', 1)[1].lower()
+    filename = None
+    try:
+        filename = storage.store_stream(file.stream, ext, raw_path(''))
+        if is_processed(filename):
+            return filename
+        with Image.open(raw_path(filename)):
+            pass
+        return filename
+    except Exception as e:
+        print(f"Error saving image: {e}")
+        if filename:
+            remove_raw(filename)
+        return None
+    finally:
+        observe_duration('image_save_seconds', {}, started)
+
+
+def remove_raw(filename):
+    # 같은 내용의 업로드/변환 작업이 동시에 지울 수 있다
+    try:
+        os.remove(raw_path(filename))
+    except FileNotFoundError:
+        pass
+
+
+# 표시 크기별 변환본 (가장 긴 변 기준 px). 아바타는 48/160, 게시물 이미지는 640/1200을 주로 사용한다.
+VARIANT_SIZES = (48, 160, 640, 1200)
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+
+
+def variant_filename(filename, size, fmt):
+    # fmt는 'webp' 또는 'fallback' (투명도가 있을 수 있는 PNG/GIF는 PNG, 나머지는 JPEG)
+    stem, ext = os.path.splitext(filename)
+    if fmt == 'webp':
+        variant_ext = 'webp'
+    else:
+        variant_ext = 'png' if ext.lower() in ('.png', '.gif') else 'jpg'
+    return f"{stem}_{size}.{variant_ext}"
+
+
+def save_variant(img, path):
+    if path.endswith('.webp'):
+        img.save(path, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif path.endswith('.png'):
+        img.save(path, 'PNG', optimize=True)
+    else:
+        img.convert('RGB').save(path, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+
+def write_variants(img, filename):
+    from PIL import Image
+    for size in VARIANT_SIZES:
+        variant = img.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        for fmt in ('webp', 'fallback'):
+            save_variant(variant, storage.upload_path(variant_filename(filename, size, fmt)))
+
+
+def normalize(img):
+    # 회전 정보를 픽셀에 반영한 뒤 EXIF/ICC 등 메타데이터는 버린다
+    from PIL import ImageOps
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'transparency' in img.info or img.mode in ('LA', 'PA', 'P') else 'RGB')
+    img.info = {}
+    return img
+
+
+def process_image(filename, source=None):
+    from PIL import Image
+    source = source or raw_path(filename)
+    with Image.open(source) as original:
+        img = normalize(original)
+        path = storage.upload_path(filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 원본 크기 파일 (예전 URL 호환용). 이미 저장된 파일에서 변환본만 만들 때는 다시 인코딩하지 않는다.
+        if source != path:
+            base = img.copy()
+            base.thumbnail((1200, 1200))
+            if filename.lower().endswith(('.jpg', '.jpeg')):
+                base.convert('RGB').save(path, quality=JPEG_QUALITY, optimize=True, progressive=True)
+            else:
+                base.save(path)
+        write_variants(img, filename)
+    if source == raw_path(filename):
+        remove_raw(filename)
+
+
+def delete_image(filename):
+    # 원본 크기 파일과 모든 변환본을 지운다
+    paths = [storage.upload_path(filename)]
+    paths += [
+        storage.upload_path(variant_filename(filename, size, fmt))
+        for size in VARIANT_SIZES for fmt in ('webp', 'fallback')
+    ]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    _known_variants.discard(filename)
+
+
+_known_variants = set()
+
+
+def has_variants(filename):
+    # 변환본이 없는 예전 업로드/기본 이미지는 원본을 그대로 쓴다 (있는 것으로 확인된 결과만 기억)
+    if not filename or filename == 'default_profile.jpg':
+        return False
+    if filename in _known_variants:
+        return True
+    # 마지막으로 쓰는 파일이 있으면 변환이 모두 끝난 것
+    if os.path.exists(storage.upload_path(variant_filename(filename, VARIANT_SIZES[-1], 'fallback'))):
+        _known_variants.add(filename)
+        return True
+    return False
+
+
+def is_processed(filename):
+    return has_variants(filename) and os.path.exists(storage.upload_path(filename))
+
+
+def release_image(filename):
+    # 해시 이름 파일은 참조 수만 줄이고(커밋 후 collect_garbage), 예전 방식 파일은 바로 지운다
+    if not filename or filename == 'default_profile.jpg':
+        return
+    if storage.is_content_name(filename):
+        storage.release(filename)
+    else:
+        delete_image(filename)
+
+
+def collect_garbage(names=None):
+    # 커밋된 뒤에 호출. 아무도 참조하지 않게 된 파일과 변환본을 지운다.
+    # 행을 지운 뒤 파일을 지우기 전에 같은 파일이 다시 참조(acquire 후 커밋)되었으면 남겨 둔다.
+    # 확인과 삭제는 finish_upload와 같은 파일별 잠금 안에서 한다.
+    claimed = storage.claim_unreferenced(names)
+    for filename in claimed:
+        with image_lock(filename):
+            referenced = storage.is_referenced(filename)
+            db.session.commit()
+            if referenced:
+                continue
+            delete_image(filename)
+            remove_raw(filename)
+    return claimed
+
+
+def finish_upload(kind, object_id, filename, pending):
+    # save_image로 저장하고 acquire한 파일의 행을 커밋한 뒤에 호출한다.
+    # 처리된 파일이 이미 있어 바로 쓰기로 했더라도, 확인과 커밋 사이에 collect_garbage가 지웠으면 원본에서 다시 만든다.
+    if not filename:
+        return
+    if not pending:
+        with image_lock(filename):
+            if is_processed(filename):
+                remove_raw(filename)
+                return
+    enqueue_image(kind, object_id, filename)
+
+
+def image_variants(filename, url_for_upload):
+    if not has_variants(filename):
+        return None
+    return {
+        'webp': ', '.join(f"{url_for_upload(variant_filename(filename, size, 'webp'))} {size}w" for size in VARIANT_SIZES),
+        'fallback': ', '.join(f"{url_for_upload(variant_filename(filename, size, 'fallback'))} {size}w" for size in VARIANT_SIZES),
+        'urls': {size: url_for_upload(variant_filename(filename, size, 'fallback')) for size in VARIANT_SIZES},
+    }
+
+
+# 이미지를 참조하는 컬럼과 처리 상태 컬럼
+IMAGE_FIELDS = {
+    'post': (Post, Post.image_filename, Post.image_status),
+    'profile': (User, User.profile_image, User.profile_image_status),
+}
+
+
+# 같은 내용의 이미지가 연달아 올라오면 작업이 여러 개 생기므로, 한 파일은 한 번에 한 워커만 변환한다
+_image_locks = [threading.Lock() for _ in range(16)]
+
+
+def image_lock(filename):
+    return _image_locks[hash(filename) % len(_image_locks)]
+
+
+def run_image_job(kind, object_id, filename):
+    model, filename_column, status_column = IMAGE_FIELDS[kind]
+    started = time.perf_counter()
+    try:
+        with image_lock(filename):
+            if is_processed(filename):
+                # 같은 내용의 다른 작업이 먼저 처리했으면 원본만 정리한다
+                remove_raw(filename)
+            else:
+                process_image(filename)
+        status = IMAGE_READY
+    except Exception as e:
+        print(f"Error processing image {filename}: {e}")
+        status = IMAGE_FAILED
+    observe_duration('image_processing_seconds', {'kind': kind, 'status': status}, started)
+
+    # 처리하는 동안 다른 이미지로 바뀌었다면 상태를 덮어쓰지 않는다
+    model.query.filter(model.id == object_id, filename_column == filename).update(
+        {status_column: status}, synchronize_session=False
+    )
+    db.session.commit()
+
+
+def enqueue_image(kind, object_id, filename):
+    # 행이 커밋된 뒤에 호출해야 한다
+    app = current_app._get_current_object()
+
+    def job():
+        with app.app_context():
+            run_image_job(kind, object_id, filename)
+
+    if app.config['IMAGE_PROCESSING_ASYNC']:
+        get_executor().submit(job)
+    else:
+        run_image_job(kind, object_id, filename)
+
+
+def pending_images():
+    for kind, (model, filename_column, status_column) in IMAGE_FIELDS.items():
+        for object_id, filename in db.session.query(model.id, filename_column).filter(status_column == IMAGE_PENDING):
+            yield kind, object_id, filename
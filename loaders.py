@@ -0,0 +1,120 @@
+from sqlalchemy.orm import joinedload
+
+from models import db, User, Post, Comment, post_likes, comment_likes
+from pagination import keyset_paginate
+
+
+# 템플릿에서 게시물 카드 하나를 그리는 데 필요한 데이터 묶음
+class PostCard:
+    def __init__(self, post, likes_count=0, comments_count=0, liked=False):
+        self.post = post
+        self.author = post.author
+        self.likes_count = likes_count
+        self.comments_count = comments_count
+        self.liked = liked
+
+    @property
+    def version(self):
+        # 캐시된 카드 조각(cache.py)의 버전. 본문/이미지 또는 작성자 프로필이 바뀌면 달라진다.
+        post, author = self.post, self.author
+        return f"{post.updated_at}|{post.image_status}|{author.profile_updated_at}|{author.profile_image_status}"
+
+
+def load_post_cards(posts, viewer=None):
+    # 좋아요/댓글 수는 게시물에 저장된 카운터를 쓰고, 내 좋아요 여부만 쿼리 1번으로 가져온다
+    posts = list(posts)
+    if not posts:
+        return []
+
+    liked_ids = set()
+    if viewer is not None and viewer.is_authenticated:
+        liked_ids = viewer.liked_post_ids(post.id for post in posts)
+
+    return [
+        PostCard(
+            post,
+            likes_count=post.likes_count,
+            comments_count=post.comments_count,
+            liked=post.id in liked_ids
+        )
+        for post in posts
+    ]
+
+
+def paginate_post_cards(query, viewer=None, after=None, before=None, per_page=10, with_total=False):
+    # 작성자는 JOIN으로 함께 가져오고, 내 좋아요 여부는 load_post_cards에서 한 번에 채운다
+    posts = keyset_paginate(
+        query.options(joinedload(Post.author)), Post,
+        after=after, before=before, per_page=per_page, with_total=with_total
+    )
+    return posts, load_post_cards(posts.items, viewer)
+
+
+def post_version_columns(viewer):
+    # 게시물 카드 하나의 내용을 결정하는 값 (PostCard.version + 카운터 + 내 좋아요 여부). Post와 작성자 JOIN에서 읽는다.
+    liked = db.exists().where(post_likes.c.post_id == Post.id, post_likes.c.user_id == viewer.id)
+    return (
+        Post.id, Post.created_at, Post.updated_at, Post.image_status, Post.likes_count, Post.comments_count,
+        User.profile_updated_at, User.profile_image_status, liked.label('liked'),
+    )
+
+
+def post_cards_version(query, viewer, after=None, before=None, per_page=10):
+    # paginate_post_cards와 같은 페이지를 카드 버전 컬럼만으로 읽는다 (조건부 GET용, 쿼리 1번)
+    page = keyset_paginate(
+        query.join(Post.author).with_entities(*post_version_columns(viewer)), Post,
+        after=after, before=before, per_page=per_page
+    )
+    return [tuple(row) for row in page.items], page.next_cursor, page.prev_cursor
+
+
+def post_card_version(post_id, viewer):
+    row = db.session.query(*post_version_columns(viewer)).join(Post.author).filter(Post.id == post_id).first()
+    return tuple(row) if row is not None else None
+
+
+def get_post_card(post_id, viewer=None):
+    post = Post.query.options(joinedload(Post.author)).filter_by(id=post_id).first_or_404()
+    return load_post_cards([post], viewer)[0]
+
+
+# 댓글 하나를 그리는 데 필요한 데이터 묶음
+class CommentCard:
+    def __init__(self, comment, likes_count=0, liked=False):
+        self.comment = comment
+        self.author = comment.author
+        self.likes_count = likes_count
+        self.liked = liked
+
+
+def load_comment_cards(comments, viewer=None):
+    # 좋아요 수는 댓글에 저장된 카운터를 쓰고, 내 좋아요 여부만 쿼리 1번으로 가져온다
+    comments = list(comments)
+    liked_ids = set()
+    if comments and viewer is not None and viewer.is_authenticated:
+        liked_ids = viewer.liked_comment_ids(comment.id for comment in comments)
+
+    return [
+        CommentCard(comment, likes_count=comment.likes_count, liked=comment.id in liked_ids)
+        for comment in comments
+    ]
+
+
+def paginate_comment_cards(post_id, viewer=None, after=None, per_page=20):
+    # 게시물의 댓글을 최신순으로 per_page개씩 (ix_comment_post_id_created_at 인덱스 사용)
+    comments = keyset_paginate(
+        Comment.query.options(joinedload(Comment.author)).filter(Comment.post_id == post_id), Comment,
+        after=after, per_page=per_page
+    )
+    return comments, load_comment_cards(comments.items, viewer)
+
+
+def comment_cards_version(post_id, viewer, after=None, per_page=20):
+    # paginate_comment_cards와 같은 페이지를 댓글 카드 버전 컬럼만으로 읽는다 (조건부 GET용, 쿼리 1번)
+    liked = db.exists().where(comment_likes.c.comment_id == Comment.id, comment_likes.c.user_id == viewer.id)
+    query = db.session.query(
+        Comment.id, Comment.created_at, Comment.updated_at, Comment.likes_count,
+        User.profile_updated_at, User.profile_image_status, liked.label('liked')
+    ).join(Comment.author).filter(Comment.post_id == post_id)
+    page = keyset_paginate(query, Comment, after=after, per_page=per_page)
+    return [tuple(row) for row in page.items], page.next_cursor
@@ -0,0 +1,282 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 요청/SQL/이미지 처리 계측
+# 값은 워커 프로세스마다 메모리에 쌓이고 /admin/metrics에서 Prometheus 텍스트 형식으로 내보낸다.
+# (render.yaml처럼 워커가 하나면 그대로 전체 값이고, 여러 워커면 스크랩할 때마다 다른 워커의 값이 보일 수 있다)
+
+# 지연 시간(초)과 요청당 쿼리 수 구간
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+MAX_SLOW_STATEMENTS = 100
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.total += 1
+        self.sum += value
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.slow_query_seconds = 0.1
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}   # (이름, 레이블) -> Histogram
+            self.counters = Counter()  # (이름, 레이블) -> 값
+            self.slow_statements = {}  # 정규화된 SQL -> [횟수, 합계(초), 최대(초)]
+
+    def init_app(self, app):
+        self.enabled = app.config['METRICS_ENABLED']
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000
+        if self.enabled:
+            app.before_request(_start_request)
+            app.after_request(_finish_request)
+        profiler.init_app(app)
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, labels, value=1):
+        with self._lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += value
+
+    def record_slow_query(self, statement, seconds):
+        with self._lock:
+            entry = self.slow_statements.get(statement)
+            if entry is None:
+                if len(self.slow_statements) >= MAX_SLOW_STATEMENTS:
+                    return
+                entry = self.slow_statements[statement] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def render(self):
+        # Prometheus 텍스트 노출 형식 (version 0.0.4)
+        lines = []
+        with self._lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+            slow = sorted(self.slow_statements.items(), key=lambda item: -item[1][1])
+
+        described = set()
+        for (name, labels), histogram in histograms:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram.total}')
+            lines.append(f'{name}_sum{format_labels(labels)} {histogram.sum:.6f}')
+            lines.append(f'{name}_count{format_labels(labels)} {histogram.total}')
+
+        for (name, labels), value in counters:
+            if name not in described:
+                described.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{format_labels(labels)} {value:g}')
+
+        if slow:
+            lines.append('# TYPE sql_slow_queries_total counter')
+            for statement, (count, _, _) in slow:
+                lines.append(f'sql_slow_queries_total{format_labels((("statement", statement),))} {count}')
+            lines.append('# TYPE sql_slow_query_seconds_total counter')
+            for statement, (_, total, _) in slow:
+                lines.append(f'sql_slow_query_seconds_total{format_labels((("statement", statement),))} {total:.6f}')
+            lines.append('# TYPE sql_slow_query_max_seconds gauge')
+            for statement, (_, _, longest) in slow:
+                lines.append(f'sql_slow_query_max_seconds{format_labels((("statement", statement),))} {longest:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels) + '}'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', ' ')
+
+
+metrics = Metrics()
+
+
+# ===== SQL 정규화 =====
+# 느린 쿼리 로그에서 같은 모양의 쿼리를 하나로 묶는다: 문자열/숫자 값은 ?, IN (?, ?, ...)은 IN (?...)
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PARAM_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_statement(statement):
+    statement = STRING_LITERAL.sub('?', statement)
+    statement = NUMBER_LITERAL.sub('?', statement)
+    statement = PARAM_LIST.sub('(?...)', statement)
+    return WHITESPACE.sub(' ', statement).strip()[:500]
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if metrics.enabled:
+        connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    started = connection.info.get('query_started')
+    if not metrics.enabled or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+
+    # 요청 중에 실행된 쿼리만 요청별로 센다 (알림 작성기/이미지 처리 스레드는 제외)
+    if has_request_context() and 'metrics_started' in g:
+        g.metrics_queries += 1
+        g.metrics_sql_seconds += elapsed
+
+    if elapsed >= metrics.slow_query_seconds:
+        normalized = normalize_statement(statement)
+        metrics.record_slow_query(normalized, elapsed)
+        endpoint = request.endpoint if has_request_context() else None
+        print(f"Slow query ({elapsed * 1000:.0f}ms, {endpoint or 'background'}): {normalized}")
+
+
+@event.listens_for(Engine, 'handle_error')
+def _discard_failed_query(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+# ===== 요청 =====
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    g.metrics_queries = 0
+    g.metrics_sql_seconds = 0.0
+    profiler.start()
+
+
+def _finish_request(response):
+    if 'metrics_started' not in g:
+        return response
+    elapsed = time.perf_counter() - g.metrics_started
+    endpoint = request.endpoint or 'unmatched'
+    labels = {'endpoint': endpoint, 'method': request.method}
+
+    metrics.observe('http_request_duration_seconds', labels, elapsed)
+    metrics.observe('http_request_sql_queries', labels, g.metrics_queries, QUERY_COUNT_BUCKETS)
+    metrics.increment('http_requests_total', dict(labels, status=str(response.status_code)))
+    metrics.increment('http_request_sql_seconds_total', labels, g.metrics_sql_seconds)
+    profiler.finish(endpoint, elapsed)
+    return response
+
+
+def observe_duration(name, labels, started):
+    # 요청 밖의 작업(이미지 저장/처리 등) 소요 시간. started는 time.perf_counter() 값.
+    if metrics.enabled:
+        metrics.observe(name, labels, time.perf_counter() - started)
+
+
+# ===== 샘플링 프로파일러 =====
+# PROFILE_SLOW_REQUESTS가 켜져 있으면 PROFILE_SAMPLE_RATE 비율의 요청에 대해
+# 백그라운드 스레드가 PROFILE_INTERVAL_MS마다 요청 스레드의 호출 스택을 기록한다.
+# 요청이 PROFILE_SLOW_MS보다 오래 걸렸으면 라우트별 파일(PROFILE_DIR/<endpoint>.folded)에
+# flamegraph.pl/speedscope가 읽는 "함수;함수;함수 횟수" 형식으로 누적한다.
+class SamplingProfiler:
+    def __init__(self):
+        self.enabled = False
+        self._active = {}  # 스레드 id -> Counter(스택)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def init_app(self, app):
+        self.enabled = app.config['PROFILE_SLOW_REQUESTS']
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.interval = app.config['PROFILE_INTERVAL_MS'] / 1000
+        self.slow_seconds = app.config['PROFILE_SLOW_MS'] / 1000
+        self.directory = app.config['PROFILE_DIR']
+
+    def start(self):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return
+        self._ensure_thread()
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def finish(self, endpoint, elapsed):
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if samples and elapsed >= self.slow_seconds:
+            self.dump(endpoint, samples)
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._active:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, samples in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        samples[folded_stack(frame)] += 1
+
+    def dump(self, endpoint, samples):
+        path = os.path.join(self.directory, f"{endpoint.replace('/', '_')}.folded")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'a', encoding='utf-8') as f:
+                for stack, count in samples.items():
+                    f.write(f'{stack} {count}\n')
+        except OSError as e:
+            print(f"Error writing profile: {e}")
+
+
+def folded_stack(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+profiler = SamplingProfiler()
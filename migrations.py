@@ -0,0 +1,295 @@
+import re
+from datetime import datetime
+
+from models import (
+    db, User, Post, Comment, Notification, StoredFile, post_likes, comment_likes, notification_actors,
+    recount_counters, recount_unread_notifications
+)
+from search import rebuild_search_index
+
+# 버전이 붙은 스키마 마이그레이션
+# db.create_all()은 없는 테이블만 만들기 때문에, 기존 운영 데이터베이스에 컬럼/인덱스를 추가하는 작업은 여기에 순서대로 쌓는다.
+# 각 마이그레이션은 이미 반영된 데이터베이스(create_all로 새로 만든 경우 포함)에서 다시 실행해도 안전해야 한다.
+MIGRATIONS = []
+
+schema_version = db.Table(
+    'schema_version',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('description', db.String(255), nullable=False),
+    db.Column('applied_at', db.DateTime, nullable=False)
+)
+
+
+def migration(version, description):
+    def decorator(f):
+        MIGRATIONS.append((version, description, f))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return f
+    return decorator
+
+
+def add_missing_columns(table, columns):
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns(table)}
+    for name, ddl in columns.items():
+        if name not in existing:
+            db.session.execute(db.text(f'ALTER TABLE "{table}" ADD COLUMN {name} {ddl}'))
+
+
+def rebuild_table(table):
+    # SQLite는 컬럼 제약을 바꾸는 ALTER를 지원하지 않으므로, 모델 정의대로 새 테이블을 만들고 데이터를 옮긴다
+    # 기존 테이블의 이름을 바꾸면 SQLite 3.26+가 다른 테이블의 외래 키까지 바뀐 이름으로 고쳐 쓰므로,
+    # <이름>_new를 만들어 데이터를 옮기고 기존 테이블을 지운 뒤 새 테이블의 이름을 바꾼다
+    connection = db.session.connection()
+    inspector = db.inspect(connection)
+    existing = {column['name'] for column in inspector.get_columns(table.name)}
+    columns = ', '.join(f'"{column.name}"' for column in table.columns if column.name in existing)
+
+    # 외래 키를 컴파일할 수 있도록 참조하는 테이블도 임시 MetaData에 복사한다
+    metadata = db.MetaData()
+    for foreign_key in table.foreign_keys:
+        referred = foreign_key.column.table
+        if referred is not table and referred.key not in metadata.tables:
+            referred.to_metadata(metadata)
+    new_table = table.to_metadata(metadata, name=f'{table.name}_new')
+
+    for index in inspector.get_indexes(table.name):
+        connection.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    new_table.create(connection)
+    connection.exec_driver_sql(
+        f'INSERT INTO "{new_table.name}" ({columns}) SELECT {columns} FROM "{table.name}"'
+    )
+    connection.exec_driver_sql(f'DROP TABLE "{table.name}"')
+    connection.exec_driver_sql(f'ALTER TABLE "{new_table.name}" RENAME TO "{table.name}"')
+
+
+def create_missing_indexes():
+    # 모델에 선언된 인덱스 중 아직 없는 것만 만든다
+    # 뒤의 마이그레이션에서 추가되는 컬럼을 쓰는 인덱스는 건너뛰고, 그 마이그레이션이 다시 호출해 만든다
+    connection = db.session.connection()
+    inspector = db.inspect(connection)
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if all(column.name in existing for column in index.columns):
+                index.create(connection, checkfirst=True)
+
+
+@migration(1, '좋아요/댓글 카운터 컬럼')
+def add_counter_columns():
+    add_missing_columns('post', {
+        'likes_count': 'INTEGER NOT NULL DEFAULT 0',
+        'comments_count': 'INTEGER NOT NULL DEFAULT 0',
+    })
+    add_missing_columns('comment', {
+        'likes_count': 'INTEGER NOT NULL DEFAULT 0',
+    })
+    # recount_counters()가 미읽음 알림 수도 다시 세므로 3번의 컬럼을 먼저 만든다
+    add_missing_columns('user', {
+        'unread_notifications_count': 'INTEGER NOT NULL DEFAULT 0',
+    })
+    db.session.commit()
+    recount_counters()
+
+
+@migration(2, '피드/댓글/알림/사용자 목록 복합 인덱스')
+def add_hot_query_indexes():
+    create_missing_indexes()
+
+
+@migration(3, '사용자별 미읽음 알림 카운터')
+def add_unread_notifications_count():
+    # 컬럼 추가와 재계산은 1번이 한다. 컬럼이 생기기 전에 1번을 적용한 데이터베이스만 여기서 추가하고 미읽음 수만 센다.
+    existing = {column['name'] for column in db.inspect(db.engine).get_columns('user')}
+    if 'unread_notifications_count' in existing:
+        return
+    add_missing_columns('user', {
+        'unread_notifications_count': 'INTEGER NOT NULL DEFAULT 0',
+    })
+    db.session.commit()
+    recount_unread_notifications()
+
+
+@migration(4, '업로드 이미지 처리 상태')
+def add_image_status_columns():
+    # 기존 이미지는 모두 처리가 끝난 상태로 본다
+    add_missing_columns('post', {
+        'image_status': "VARCHAR(20) NOT NULL DEFAULT 'ready'",
+    })
+    add_missing_columns('user', {
+        'profile_image_status': "VARCHAR(20) NOT NULL DEFAULT 'ready'",
+    })
+    db.session.commit()
+
+
+@migration(5, '내용 해시 업로드 파일 참조 수')
+def add_stored_file_table():
+    # 기존 업로드는 예전 이름 그대로 두고, 새 업로드부터 해시 이름과 참조 수를 사용한다
+    StoredFile.__table__.create(db.engine, checkfirst=True)
+
+
+@migration(6, '프로필 수정 시각')
+def add_profile_updated_at():
+    add_missing_columns('user', {
+        'profile_updated_at': 'TIMESTAMP',
+    })
+    db.session.commit()
+
+
+@migration(7, '게시물/댓글 전문 검색 색인')
+def add_search_index():
+    # SQLite(FTS5)에서만 색인을 만들고 기존 글을 채운다. 다른 데이터베이스는 LIKE 검색을 쓴다.
+    rebuild_search_index()
+
+
+@migration(8, '좋아요 알림 합치기')
+def add_like_notification_columns():
+    add_missing_columns('notification', {
+        'related_comment_id': 'INTEGER',
+        'actor_count': 'INTEGER NOT NULL DEFAULT 1',
+    })
+    db.session.commit()
+
+
+@migration(9, '알림 문구 대신 구조화된 필드')
+def drop_notification_messages():
+    # 알림 문구는 화면에서 type/related_*/actor_count로 만들므로 message를 NULL 허용으로 바꾸고 비운다
+    if db.engine.dialect.name == 'sqlite':
+        rebuild_table(Notification.__table__)
+    else:
+        db.session.execute(db.text('ALTER TABLE notification ALTER COLUMN message DROP NOT NULL'))
+    db.session.execute(db.update(Notification).values(message=None))
+
+    # 관리자에게 간 가입 신청 알림은 'signup' 종류로 구분한다
+    admin_ids = db.select(User.id).where(User.is_admin == True)
+    db.session.execute(
+        db.update(Notification)
+        .where(Notification.type == 'approval', Notification.user_id.in_(admin_ids))
+        .values(type='signup')
+    )
+    db.session.commit()
+
+
+@migration(10, '거절된 사용자 비활성 표시')
+def add_user_is_active():
+    add_missing_columns('user', {
+        'is_active': 'BOOLEAN NOT NULL DEFAULT TRUE',
+    })
+    db.session.commit()
+
+
+@migration(11, '합쳐진 알림의 참여자')
+def add_notification_actors():
+    # 기존 알림은 마지막 참여자만 알 수 있으므로 그 사람을 참여자로 넣는다 (표시 중인 사람 수는 그대로 둠)
+    notification_actors.create(db.engine, checkfirst=True)
+    notifications = Notification.__table__
+    existing = db.select(notification_actors.c.notification_id).where(
+        notification_actors.c.notification_id == notifications.c.id
+    )
+    db.session.execute(notification_actors.insert().from_select(
+        ['notification_id', 'user_id'],
+        db.select(notifications.c.id, notifications.c.related_user_id).where(
+            notifications.c.type.in_(['comment', 'like']),
+            notifications.c.related_user_id.isnot(None),
+            ~db.exists(existing)
+        )
+    ))
+    db.session.commit()
+
+
+@migration(12, '알림 참여자 외래 키 복구')
+def repair_notification_actors_foreign_key():
+    # 예전 rebuild_table(9번)이 알림 테이블 이름을 바꿀 때 notification_actors의 외래 키가
+    # 지워진 notification_old를 가리키게 된 데이터베이스를 고친다
+    if db.engine.dialect.name != 'sqlite':
+        return
+    foreign_keys = db.inspect(db.session.connection()).get_foreign_keys(notification_actors.name)
+    if not any(key['referred_table'] == 'notification_old' for key in foreign_keys):
+        return
+    notifications = Notification.__table__
+    db.session.execute(notification_actors.delete().where(
+        ~notification_actors.c.notification_id.in_(db.select(notifications.c.id))
+    ))
+    rebuild_table(notification_actors)
+    db.session.commit()
+
+
+@migration(13, '관리자 전체 사용자 목록 인덱스')
+def add_admin_all_users_index():
+    create_missing_indexes()
+    db.session.commit()
+
+
+def current_version():
+    schema_version.create(db.engine, checkfirst=True)
+    return db.session.execute(db.select(db.func.max(schema_version.c.version))).scalar() or 0
+
+
+def upgrade():
+    applied = []
+    version = current_version()
+    for target, description, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        apply()
+        db.session.execute(schema_version.insert().values(
+            version=target, description=description, applied_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        applied.append((target, description))
+    return applied
+
+
+# ===== 쿼리 플랜 점검 =====
+# 자주 호출되는 라우트의 쿼리 모양. 인덱스 없이 테이블 전체를 읽으면 점검이 실패한다.
+def hot_queries():
+    now = datetime.utcnow()
+    queries = {
+        'feed': Post.query.filter(Post.created_at < now)
+            .order_by(Post.created_at.desc(), Post.id.desc()).limit(11),
+        'feed_category': Post.query.filter(Post.category == '일상', Post.created_at < now)
+            .order_by(Post.created_at.desc(), Post.id.desc()).limit(11),
+        'profile_posts': Post.query.filter(Post.user_id == 1, Post.created_at < now)
+            .order_by(Post.created_at.desc(), Post.id.desc()).limit(11),
+        'profile_comments_count': db.session.query(db.func.count(Comment.id)).filter(Comment.user_id == 1),
+        'post_comments': Comment.query.filter(Comment.post_id == 1)
+            .order_by(Comment.created_at.desc(), Comment.id.desc()).limit(21),
+        'liked_post_ids': db.session.query(post_likes.c.post_id)
+            .filter(post_likes.c.user_id == 1, post_likes.c.post_id.in_([1, 2, 3])),
+        'post_likers': db.session.query(post_likes.c.user_id).filter(post_likes.c.post_id == 1),
+        'liked_comment_ids': db.session.query(comment_likes.c.comment_id)
+            .filter(comment_likes.c.user_id == 1, comment_likes.c.comment_id.in_([1, 2, 3])),
+        'notifications': Notification.query.filter(Notification.user_id == 1)
+            .order_by(Notification.created_at.desc(), Notification.id.desc()).limit(21),
+        'unread_count': db.session.query(db.func.count(Notification.id))
+            .filter(Notification.user_id == 1, Notification.is_read == False),
+    }
+    # 관리자 사용자 목록은 라우트와 같은 쿼리에 keyset_paginate와 같은 정렬/개수를 붙인다
+    from moderation import admin_users_query
+    for filter_type in ('pending', 'approved', 'all'):
+        queries[f'admin_users_{filter_type}'] = admin_users_query(filter_type).filter(User.created_at < now) \
+            .order_by(User.created_at.desc(), User.id.desc()).limit(11)
+    return queries
+
+
+# SQLite 3.36 이전은 'SCAN TABLE post', 이후는 'SCAN post'로 출력한다 (인덱스를 쓰면 뒤에 USING ...이 붙음)
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)$')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE FOR ORDER BY')
+
+
+def check_query_plans():
+    # SQLite의 EXPLAIN QUERY PLAN 결과에서 전체 테이블 스캔/정렬용 임시 B-트리를 찾는다
+    problems = {}
+    connection = db.session.connection()
+    for name, query in hot_queries().items():
+        compiled = query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'render_postcompile': True})
+        params = tuple(
+            str(value) if isinstance(value, datetime) else value
+            for value in (compiled.params[key] for key in compiled.positiontup)
+        )
+        plan = [row[-1] for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + str(compiled), params)]
+        bad = [detail for detail in plan if FULL_SCAN.match(detail) or TEMP_SORT.search(detail)]
+        if bad:
+            problems[name] = bad
+    return problems
@@ -1,25 +1,60 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
 from datetime import datetime
 
+from security import hash_password
+
 db = SQLAlchemy()
 
+def insert_or_ignore(table, session=None, **values):
+    # 같은 기본 키의 행이 이미 있으면 아무것도 하지 않는다 (INSERT ... ON CONFLICT DO NOTHING)
+    # 동시에 같은 행을 넣어도 충돌 오류 없이 한 번만 들어가고, 실제로 넣었는지(True/False)를 돌려준다
+    session = session or db.session
+    dialect = session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(**values).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(**values).on_conflict_do_nothing()
+    else:
+        statement = table.insert().values(**values).prefix_with('IGNORE')
+    return session.execute(statement).rowcount > 0
+
 # 좋아요 관계 테이블 (Post)
+# 기본 키 (user_id, post_id)가 "내가 좋아요했는지" 조회를, post_id 인덱스가 게시물별 조회를 맡는다
 post_likes = db.Table(
     'post_likes',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True)
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
+    db.Index('ix_post_likes_post_id', 'post_id')
 )
 
 # 좋아요 관계 테이블 (Comment)
 comment_likes = db.Table(
     'comment_likes',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('comment_id', db.Integer, db.ForeignKey('comment.id'), primary_key=True)
+    db.Column('comment_id', db.Integer, db.ForeignKey('comment.id'), primary_key=True),
+    db.Index('ix_comment_likes_comment_id', 'comment_id')
+)
+
+# 합쳐진 알림(좋아요/댓글)에 참여한 사람. Notification.actor_count는 이 테이블의 행 수와 같다
+# (같은 사람이 좋아요를 취소했다가 다시 누르거나 여러 번 댓글을 달아도 한 명)
+notification_actors = db.Table(
+    'notification_actors',
+    db.Column('notification_id', db.Integer, db.ForeignKey('notification.id'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
+    db.Index('ix_notification_actors_user_id', 'user_id')
 )
 
 class User(UserMixin, db.Model):
+    # 관리자 사용자 목록 (승인 상태별 탭과 전체 탭, 가입 순)
+    __table_args__ = (
+        db.Index('ix_user_is_approved_is_admin_created_at', 'is_approved', 'is_admin', 'created_at', 'id'),
+        db.Index('ix_user_is_admin_is_active_created_at', 'is_admin', 'is_active', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
@@ -27,9 +62,15 @@ class User(UserMixin, db.Model):
     display_name = db.Column(db.String(80), nullable=False)
     bio = db.Column(db.Text, default='')
     profile_image = db.Column(db.String(255), default='default_profile.jpg')
+    profile_image_status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')  # pending/ready/failed
+    profile_updated_at = db.Column(db.DateTime)  # 표시 이름/프로필 이미지 변경 시각 (게시물 카드 캐시 버전)
     is_approved = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
+    # 거절되어 정리(moderation.py)를 기다리는 사용자는 False. Flask-Login은 비활성 사용자의 로그인을 거부한다.
+    is_active = db.Column(db.Boolean, nullable=False, default=True, server_default=db.true())
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # 미읽음 알림 수 (알림 생성/읽음 처리 시 함께 갱신되어 배지 조회가 기본 키 조회 한 번으로 끝남)
+    unread_notifications_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     # 관계 설정 - delete-orphan 제거하여 게시물/댓글 자동 삭제 방지
     posts = db.relationship('Post', backref='author', lazy=True, foreign_keys='Post.user_id')
@@ -38,67 +79,179 @@ class User(UserMixin, db.Model):
     liked_comments = db.relationship('Comment', secondary=comment_likes, backref='liked_by')
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        # 해시 방식은 config.PASSWORD_HASH_METHOD, 계산은 security.py의 해시 풀에서
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
     
+    # 좋아요는 관계 컬렉션을 불러오지 않고 post_likes/comment_likes 행 하나만 추가/삭제한다
+    # 좋아요 행과 저장된 카운터는 같은 트랜잭션에서 함께 바뀐다
+    # 카운터 변경은 수정으로 보지 않으므로 updated_at은 그대로 둔다 (게시물 카드 캐시 버전)
+    # 이미 좋아요한 상태/이미 취소한 상태에서 다시 호출해도 카운터는 한 번만 바뀐다 (반환값: 실제로 바뀌었는지)
     def like_post(self, post):
-        if not self.has_liked_post(post):
-            self.liked_posts.append(post)
+        if not insert_or_ignore(post_likes, user_id=self.id, post_id=post.id):
+            return False
+        post.likes_count = Post.likes_count + 1
+        post.updated_at = Post.updated_at
+        return True
     
     def unlike_post(self, post):
-        if self.has_liked_post(post):
-            self.liked_posts.remove(post)
+        result = db.session.execute(post_likes.delete().where(
+            post_likes.c.user_id == self.id, post_likes.c.post_id == post.id
+        ))
+        if not result.rowcount:
+            return False
+        post.likes_count = Post.likes_count - 1
+        post.updated_at = Post.updated_at
+        return True
     
     def has_liked_post(self, post):
-        return post in self.liked_posts
+        return db.session.query(db.exists().where(
+            post_likes.c.user_id == self.id, post_likes.c.post_id == post.id
+        )).scalar()
+    
+    def liked_post_ids(self, post_ids):
+        # 한 페이지 분량의 게시물 중 내가 좋아요한 ID 집합
+        post_ids = list(post_ids)
+        if not post_ids:
+            return set()
+        return {
+            post_id for (post_id,) in db.session.query(post_likes.c.post_id)
+            .filter(post_likes.c.user_id == self.id, post_likes.c.post_id.in_(post_ids))
+        }
     
     def like_comment(self, comment):
-        if not self.has_liked_comment(comment):
-            self.liked_comments.append(comment)
+        if not insert_or_ignore(comment_likes, user_id=self.id, comment_id=comment.id):
+            return False
+        comment.likes_count = Comment.likes_count + 1
+        comment.updated_at = Comment.updated_at
+        return True
     
     def unlike_comment(self, comment):
-        if self.has_liked_comment(comment):
-            self.liked_comments.remove(comment)
+        result = db.session.execute(comment_likes.delete().where(
+            comment_likes.c.user_id == self.id, comment_likes.c.comment_id == comment.id
+        ))
+        if not result.rowcount:
+            return False
+        comment.likes_count = Comment.likes_count - 1
+        comment.updated_at = Comment.updated_at
+        return True
     
     def has_liked_comment(self, comment):
-        return comment in self.liked_comments
+        return db.session.query(db.exists().where(
+            comment_likes.c.user_id == self.id, comment_likes.c.comment_id == comment.id
+        )).scalar()
+    
+    def liked_comment_ids(self, comment_ids):
+        comment_ids = list(comment_ids)
+        if not comment_ids:
+            return set()
+        return {
+            comment_id for (comment_id,) in db.session.query(comment_likes.c.comment_id)
+            .filter(comment_likes.c.user_id == self.id, comment_likes.c.comment_id.in_(comment_ids))
+        }
 
 class Post(db.Model):
+    # 피드(전체/카테고리별)와 프로필의 최신순 커서 페이지네이션
+    __table_args__ = (
+        db.Index('ix_post_created_at', 'created_at', 'id'),
+        db.Index('ix_post_category_created_at', 'category', 'created_at', 'id'),
+        db.Index('ix_post_user_id_created_at', 'user_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False, default='일상')
     image_filename = db.Column(db.String(255))
+    image_status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')  # pending/ready/failed
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    comments_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     
     def get_likes_count(self):
-        return len(self.liked_by)
+        return self.likes_count
 
 class Comment(db.Model):
+    # 게시물별 댓글 목록, 사용자별 댓글 수
+    __table_args__ = (
+        db.Index('ix_comment_post_id_created_at', 'post_id', 'created_at', 'id'),
+        db.Index('ix_comment_user_id', 'user_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    likes_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     
     def get_likes_count(self):
-        return len(self.liked_by)
+        return self.likes_count
 
 class Notification(db.Model):
+    # 알림 목록(최신순)과 미읽음 개수
+    __table_args__ = (
+        db.Index('ix_notification_user_id_created_at', 'user_id', 'created_at', 'id'),
+        db.Index('ix_notification_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    type = db.Column(db.String(50), nullable=False)  # 'comment', 'like', 'approval'
-    message = db.Column(db.String(255), nullable=False)
+    type = db.Column(db.String(50), nullable=False)  # 'comment', 'like', 'approval', 'signup' (notifications.py)
+    message = db.Column(db.String(255), nullable=True)  # 예전 알림의 문구. 새 알림은 구조화된 필드로 화면에서 만든다.
     related_user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     related_post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=True)
+    related_comment_id = db.Column(db.Integer, nullable=True)  # 댓글 좋아요 알림 (댓글이 지워져도 알림은 남으므로 외래 키 없음)
+    actor_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # 합쳐진 알림의 서로 다른 사람 수 (notification_actors)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     user = db.relationship('User', foreign_keys=[user_id], backref='received_notifications')
     related_user = db.relationship('User', foreign_keys=[related_user_id])
+
+# 알림이 어디서 만들어지든 같은 트랜잭션에서 받는 사람의 미읽음 카운터를 올린다
+@db.event.listens_for(Notification, 'after_insert')
+def increment_unread_count(mapper, connection, target):
+    if not target.is_read:
+        users = User.__table__
+        connection.execute(
+            users.update()
+            .where(users.c.id == target.user_id)
+            .values(unread_notifications_count=users.c.unread_notifications_count + 1)
+        )
+
+def recount_counters():
+    # 저장된 좋아요/댓글/미읽음 알림 카운터를 실제 행 기준으로 다시 계산
+    post_likes_total = db.select(db.func.count()).select_from(post_likes) \
+        .where(post_likes.c.post_id == Post.id).scalar_subquery()
+    post_comments_total = db.select(db.func.count(Comment.id)) \
+        .where(Comment.post_id == Post.id).scalar_subquery()
+    comment_likes_total = db.select(db.func.count()).select_from(comment_likes) \
+        .where(comment_likes.c.comment_id == Comment.id).scalar_subquery()
+    
+    # 카운터 보정은 수정 시각을 건드리지 않는다
+    db.session.execute(db.update(Post).values(
+        likes_count=post_likes_total, comments_count=post_comments_total, updated_at=Post.updated_at
+    ))
+    db.session.execute(db.update(Comment).values(
+        likes_count=comment_likes_total, updated_at=Comment.updated_at
+    ))
+    recount_unread_notifications()
+
+def recount_unread_notifications():
+    unread_total = db.select(db.func.count(Notification.id)) \
+        .where(Notification.user_id == User.id, Notification.is_read == False).scalar_subquery()
+    db.session.execute(db.update(User).values(unread_notifications_count=unread_total))
+    db.session.commit()
+
+class StoredFile(db.Model):
+    # 내용 해시 이름으로 저장된 업로드 파일과 이를 가리키는 게시물/프로필 수 (storage.py 참고)
+    name = db.Column(db.String(255), primary_key=True)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,263 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import bindparam
+
+from models import db, User, Post, Comment, Notification, post_likes, comment_likes, notification_actors
+from notifications import NOTIFY_APPROVAL
+from images import release_image, collect_garbage
+from identity import identity_cache
+from cache import fragment_cache
+from search import post_rowid, comment_rowid, unindex_rows
+
+# 관리자 일괄 승인/거절
+# 승인/거절은 요청 하나에서 집합 단위 UPDATE/INSERT로 처리하고 바로 커밋한다.
+# 거절된 사용자는 is_active=False로 표시해 즉시 로그인/세션을 막고, 게시물/댓글/좋아요/알림/이미지는
+# 백그라운드 정리 작업이 PURGE_CHUNK_SIZE개씩 짧은 트랜잭션으로 지운 뒤 마지막에 사용자 행을 지운다.
+# 정리 중 서버가 재시작되면 'flask --app app purge-rejected-users'로 이어서 지울 수 있다.
+MAX_BULK_USERS = 500
+PURGE_CHUNK_SIZE = 500
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # 정리 작업은 한 번에 하나씩 (쓰기 잠금을 두고 요청과 경쟁하지 않도록)
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='user-purge')
+        return _executor
+
+
+def moderatable_ids(user_ids, **filters):
+    # 관리자가 아니고 아직 거절되지 않은 사용자만 대상으로 한다
+    user_ids = list(dict.fromkeys(int(user_id) for user_id in user_ids))[:MAX_BULK_USERS]
+    if not user_ids:
+        return []
+    query = db.session.query(User.id).filter(
+        User.id.in_(user_ids), User.is_admin == False, User.is_active == True
+    ).filter_by(**filters)
+    return [user_id for (user_id,) in query]
+
+
+def approve_users(user_ids, admin_id):
+    ids = moderatable_ids(user_ids, is_approved=False)
+    if not ids:
+        return []
+    users = User.__table__
+    db.session.execute(users.update().where(users.c.id.in_(ids)).values(
+        is_approved=True,
+        unread_notifications_count=users.c.unread_notifications_count + 1
+    ))
+    # 승인 알림을 INSERT ... SELECT 한 번으로 넣는다 (대기 중인 사용자는 접속해 있지 않으므로 SSE 발행은 필요 없음)
+    notifications = Notification.__table__
+    db.session.execute(notifications.insert().from_select(
+        ['user_id', 'type', 'related_user_id', 'actor_count', 'is_read', 'created_at'],
+        db.select(
+            users.c.id, db.literal(NOTIFY_APPROVAL), db.literal(admin_id), db.literal(1),
+            db.false(), db.literal(datetime.utcnow())
+        ).where(users.c.id.in_(ids))
+    ))
+    db.session.commit()
+    for user_id in ids:
+        identity_cache.invalidate(user_id)
+    return ids
+
+
+def reject_users(user_ids):
+    ids = moderatable_ids(user_ids)
+    if not ids:
+        return []
+    db.session.execute(
+        db.update(User).where(User.id.in_(ids)).values(is_active=False, is_approved=False)
+    )
+    db.session.commit()
+    for user_id in ids:
+        identity_cache.invalidate(user_id)
+    enqueue_purge(ids)
+    return ids
+
+
+def enqueue_purge(user_ids):
+    # 사용자 행이 is_active=False로 커밋된 뒤에 호출해야 한다
+    app = current_app._get_current_object()
+
+    def job():
+        with app.app_context():
+            for user_id in user_ids:
+                purge_user(user_id)
+
+    if app.config['USER_PURGE_ASYNC']:
+        get_executor().submit(job)
+    else:
+        for user_id in user_ids:
+            purge_user(user_id)
+
+
+# 관리자 사용자 목록의 탭별 조건 (쿼리 플랜 점검도 같은 쿼리를 쓴다)
+def admin_users_query(filter_type):
+    if filter_type == 'pending':
+        return User.query.filter_by(is_approved=False, is_admin=False, is_active=True)
+    if filter_type == 'approved':
+        return User.query.filter_by(is_approved=True, is_admin=False, is_active=True)
+    return User.query.filter_by(is_admin=False, is_active=True)
+
+
+def rejected_user_ids():
+    return [user_id for (user_id,) in db.session.query(User.id).filter(User.is_active == False)]
+
+
+# ===== 정리 작업 =====
+def purge_user(user_id, chunk_size=PURGE_CHUNK_SIZE):
+    try:
+        _purge_likes(user_id, chunk_size)
+        _purge_comments(Comment.user_id == user_id, chunk_size)
+        _purge_posts(user_id, chunk_size)
+        _purge_actor(user_id, chunk_size)
+        # 받은 알림과 이 사용자가 보낸 알림 (사용자 행을 지우기 직전에 지워서 그 사이 작성기가 쓴 알림도 함께 지움)
+        _purge_notifications(
+            db.or_(Notification.user_id == user_id, Notification.related_user_id == user_id), chunk_size
+        )
+        user = db.session.get(User, user_id)
+        if user is not None:
+            profile_image = user.profile_image
+            release_image(profile_image)
+            db.session.delete(user)
+            db.session.commit()
+            collect_garbage([profile_image])
+        print(f"Purged rejected user {user_id}")
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error purging user {user_id}: {e}")
+
+
+def _chunks(query, chunk_size):
+    # 매번 남은 것 중 앞부분을 다시 읽는다 (지운 행은 다음 조회에서 빠짐)
+    while True:
+        rows = query.limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+
+
+def _decrement(table, column, counts):
+    # {id: 줄일 수}를 executemany UPDATE 한 번으로 반영한다. 카운터 변경은 수정 시각을 바꾸지 않는다.
+    if not counts:
+        return
+    db.session.execute(
+        table.update().where(table.c.id == bindparam('target_id')).values({
+            column: table.c[column] - bindparam('amount'),
+            'updated_at': table.c.updated_at,
+        }),
+        [{'target_id': target_id, 'amount': amount} for target_id, amount in counts.items()]
+    )
+
+
+def _count_by(rows):
+    counts = {}
+    for key in rows:
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+def _purge_likes(user_id, chunk_size):
+    # 사용자가 누른 좋아요를 지우면서 게시물/댓글의 카운터를 되돌린다
+    query = db.session.query(post_likes.c.post_id).filter(post_likes.c.user_id == user_id)
+    for rows in _chunks(query, chunk_size):
+        post_ids = [post_id for (post_id,) in rows]
+        _decrement(Post.__table__, 'likes_count', {post_id: 1 for post_id in post_ids})
+        db.session.execute(post_likes.delete().where(
+            post_likes.c.user_id == user_id, post_likes.c.post_id.in_(post_ids)
+        ))
+        db.session.commit()
+
+    query = db.session.query(comment_likes.c.comment_id).filter(comment_likes.c.user_id == user_id)
+    for rows in _chunks(query, chunk_size):
+        comment_ids = [comment_id for (comment_id,) in rows]
+        _decrement(Comment.__table__, 'likes_count', {comment_id: 1 for comment_id in comment_ids})
+        db.session.execute(comment_likes.delete().where(
+            comment_likes.c.user_id == user_id, comment_likes.c.comment_id.in_(comment_ids)
+        ))
+        db.session.commit()
+
+
+def _purge_comments(condition, chunk_size, adjust_posts=True):
+    # 댓글과 그 좋아요/검색 색인을 지운다. 남는 게시물의 댓글 수는 줄인다.
+    query = db.session.query(Comment.id, Comment.post_id).filter(condition)
+    for rows in _chunks(query, chunk_size):
+        comment_ids = [comment_id for comment_id, _ in rows]
+        if adjust_posts:
+            _decrement(Post.__table__, 'comments_count', _count_by(post_id for _, post_id in rows))
+        db.session.execute(comment_likes.delete().where(comment_likes.c.comment_id.in_(comment_ids)))
+        unindex_rows(db.session.connection(), [comment_rowid(comment_id) for comment_id in comment_ids])
+        db.session.execute(db.delete(Comment).where(Comment.id.in_(comment_ids)))
+        db.session.commit()
+
+
+def _purge_posts(user_id, chunk_size):
+    # 게시물 단위로 다른 사람의 댓글, 좋아요, 게시물을 가리키는 알림, 이미지까지 함께 지운다
+    query = db.session.query(Post.id, Post.image_filename).filter(Post.user_id == user_id)
+    for rows in _chunks(query, max(1, chunk_size // 10)):
+        post_ids = [post_id for post_id, _ in rows]
+        _purge_comments(Comment.post_id.in_(post_ids), chunk_size, adjust_posts=False)
+        _purge_notifications(Notification.related_post_id.in_(post_ids), chunk_size)
+
+        images = [filename for _, filename in rows if filename]
+        for filename in images:
+            release_image(filename)
+        db.session.execute(post_likes.delete().where(post_likes.c.post_id.in_(post_ids)))
+        unindex_rows(db.session.connection(), [post_rowid(post_id) for post_id in post_ids])
+        db.session.execute(db.delete(Post).where(Post.id.in_(post_ids)))
+        db.session.commit()
+
+        collect_garbage(images)
+        for post_id in post_ids:
+            fragment_cache.invalidate_post(post_id)
+
+
+def _purge_notifications(condition, chunk_size):
+    # 읽지 않은 알림을 지우면 받는 사람의 미읽음 카운터도 줄인다
+    query = db.session.query(Notification.id, Notification.user_id, Notification.is_read).filter(condition)
+    for rows in _chunks(query, chunk_size):
+        unread = _count_by(user_id for _, user_id, is_read in rows if not is_read)
+        if unread:
+            users = User.__table__
+            db.session.execute(
+                users.update().where(users.c.id == bindparam('target_id')).values(
+                    unread_notifications_count=users.c.unread_notifications_count - bindparam('amount')
+                ),
+                [{'target_id': user_id, 'amount': amount} for user_id, amount in unread.items()]
+            )
+        notification_ids = [row[0] for row in rows]
+        db.session.execute(notification_actors.delete().where(notification_actors.c.notification_id.in_(notification_ids)))
+        db.session.execute(db.delete(Notification).where(Notification.id.in_(notification_ids)))
+        db.session.commit()
+
+
+def _purge_actor(user_id, chunk_size):
+    # 다른 사람이 받은 합쳐진 알림에서 이 사용자를 빼고 사람 수를 줄인다.
+    # 이 사용자가 표시되던 알림은 남은 참여자 중 한 명을 대신 보여주고, 남은 참여자가 없을 때만 지운다.
+    actors = notification_actors.c
+    query = db.session.query(actors.notification_id).filter(actors.user_id == user_id)
+    for rows in _chunks(query, chunk_size):
+        notification_ids = [notification_id for (notification_id,) in rows]
+        db.session.execute(notification_actors.delete().where(
+            actors.user_id == user_id, actors.notification_id.in_(notification_ids)
+        ))
+        db.session.execute(
+            db.update(Notification).where(Notification.id.in_(notification_ids), Notification.actor_count > 1)
+            .values(actor_count=Notification.actor_count - 1)
+        )
+        remaining = db.select(db.func.max(actors.user_id)).where(actors.notification_id == Notification.id)
+        db.session.execute(
+            db.update(Notification).where(Notification.id.in_(notification_ids), Notification.related_user_id == user_id)
+            .values(related_user_id=remaining.scalar_subquery())
+        )
+        db.session.commit()
+        _purge_notifications(
+            db.and_(Notification.id.in_(notification_ids), Notification.related_user_id.is_(None)), chunk_size
+        )
@@ -0,0 +1,171 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User, Post, Notification, notification_actors, insert_or_ignore
+
+# 알림 종류
+# (알림 문구는 저장하지 않고 종류/관련 사용자/게시물/댓글/사람 수로 notifications.html에서 만든다)
+NOTIFY_COMMENT = 'comment'    # 내 게시물에 댓글
+NOTIFY_LIKE = 'like'          # 내 게시물/댓글에 좋아요 (related_comment_id가 있으면 댓글)
+NOTIFY_APPROVAL = 'approval'  # 내 가입 승인
+NOTIFY_SIGNUP = 'signup'      # (관리자) 새 가입 신청
+
+# 같은 대상에 대한 읽지 않은 알림이 시간 창 안에 있으면 새 행을 만들지 않고 "A님 외 N명"으로 합친다
+COALESCED_TYPES = {NOTIFY_COMMENT, NOTIFY_LIKE}
+
+
+def notify(type, user_id, actor_id=None, post_id=None, comment_id=None):
+    # 요청에서는 알림을 세션에 기록만 해 둔다. 커밋이 성공하면 작성기로 넘어가고, 롤백되면 버려진다.
+    # 알림 때문에 커밋을 한 번 더 하거나, 알림 INSERT가 요청의 트랜잭션을 길게 만들지 않는다.
+    if actor_id is not None and actor_id == user_id:
+        return
+    db.session.info.setdefault('notification_events', []).append({
+        'type': type,
+        'user_id': user_id,
+        'actor_id': actor_id,
+        'post_id': post_id,
+        'comment_id': comment_id,
+        'at': datetime.utcnow(),
+    })
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_notifications(session):
+    events = session.info.pop('notification_events', None)
+    if events:
+        writer.submit(current_app._get_current_object(), events)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notification_events(session):
+    session.info.pop('notification_events', None)
+
+
+def write_notifications(session, events, window):
+    # 한 묶음의 알림을 한 트랜잭션으로 쓴다
+    for item in live_events(session, events):
+        if item['type'] in COALESCED_TYPES and coalesce(session, item, window):
+            continue
+        notification = Notification(
+            user_id=item['user_id'],
+            type=item['type'],
+            related_user_id=item['actor_id'],
+            related_post_id=item['post_id'],
+            related_comment_id=item['comment_id'],
+            created_at=item['at']
+        )
+        session.add(notification)
+        if item['type'] in COALESCED_TYPES and item['actor_id']:
+            session.flush()
+            insert_or_ignore(notification_actors, session=session, notification_id=notification.id, user_id=item['actor_id'])
+    session.commit()
+
+
+def live_events(session, events):
+    # 커밋과 작성 사이에 거절/삭제된 사용자나 게시물을 가리키는 알림은 버린다 (moderation.py 정리 작업 참고)
+    user_ids = {item['user_id'] for item in events} | {item['actor_id'] for item in events if item['actor_id']}
+    post_ids = {item['post_id'] for item in events if item['post_id']}
+    active_users = {user_id for (user_id,) in session.query(User.id).filter(User.id.in_(user_ids), User.is_active == True)}
+    live_posts = {post_id for (post_id,) in session.query(Post.id).filter(Post.id.in_(post_ids))} if post_ids else set()
+    return [
+        item for item in events
+        if item['user_id'] in active_users
+        and (not item['actor_id'] or item['actor_id'] in active_users)
+        and (not item['post_id'] or item['post_id'] in live_posts)
+    ]
+
+
+def coalesce(session, item, window):
+    # 묶음 안에서 앞서 추가한 알림도 autoflush로 함께 찾는다
+    existing = session.query(Notification).filter(
+        Notification.user_id == item['user_id'],
+        Notification.type == item['type'],
+        Notification.related_post_id == item['post_id'],
+        Notification.related_comment_id == item['comment_id'],
+        Notification.is_read == False,
+        Notification.created_at >= item['at'] - window
+    ).order_by(Notification.created_at.desc()).first()
+    if existing is None:
+        return False
+
+    # 이미 참여한 사람이면(좋아요를 취소했다가 다시 누름, 댓글을 여러 번 닮) 사람 수를 늘리지 않는다.
+    # 표시되는 이름은 가장 최근에 참여한 사람으로 바꾼다.
+    if insert_or_ignore(notification_actors, session=session, notification_id=existing.id, user_id=item['actor_id']):
+        existing.actor_count = Notification.actor_count + 1
+    existing.related_user_id = item['actor_id']
+    existing.created_at = item['at']
+    return True
+
+
+# ===== 작성기 =====
+# 커밋된 알림을 큐에 모았다가 BATCH_INTERVAL 동안 들어온 것(최대 BATCH_SIZE개)을 한 번에 쓴다.
+# 워커 프로세스마다 스레드 하나가 처음 알림이 생길 때 시작된다 (gunicorn --preload 후 fork해도 안전).
+# NOTIFICATION_ASYNC가 꺼져 있으면(관리 명령/테스트) 커밋 직후 별도 세션으로 바로 쓴다.
+class NotificationWriter:
+    BATCH_SIZE = 200
+    BATCH_INTERVAL = 0.5
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, app, events):
+        if not app.config['NOTIFICATION_ASYNC']:
+            self.write(app, events)
+            return
+        self._ensure_thread()
+        for item in events:
+            self._queue.put((app, item))
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notification-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.BATCH_INTERVAL
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            apps = {}
+            for app, item in batch:
+                apps.setdefault(app, []).append(item)
+            for app, events in apps.items():
+                self.write(app, events)
+            for _ in batch:
+                self._queue.task_done()
+
+    def write(self, app, events):
+        window = timedelta(seconds=app.config['NOTIFICATION_COALESCE_WINDOW'])
+        with app.app_context():
+            session = Session(db.engine)
+            try:
+                write_notifications(session, events, window)
+            except Exception as e:
+                session.rollback()
+                print(f"Error writing notifications: {e}")
+            finally:
+                session.close()
+
+    def join(self):
+        # 큐에 있는 알림을 모두 쓸 때까지 기다린다
+        self._queue.join()
+
+
+writer = NotificationWriter()
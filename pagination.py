@@ -0,0 +1,75 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+# (created_at, id) 키를 URL에 넣을 수 있는 불투명한 문자열로 변환
+def encode_cursor(created_at, item_id):
+    raw = json.dumps([created_at.isoformat(), item_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, item_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+
+# 커서 기반 한 페이지 결과 (템플릿에서 Pagination 대신 사용)
+class KeysetPage:
+    def __init__(self, items, next_cursor=None, prev_cursor=None, total=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, model, after=None, before=None, per_page=10, with_total=False):
+    # 최신순 (created_at DESC, id DESC) 정렬에서 커서 위치부터 per_page + 1개만 읽는다
+    # OFFSET을 쓰지 않으므로 몇 번째 페이지든 비용이 같다
+    created_at = model.created_at
+    item_id = model.id
+
+    total = query.order_by(None).count() if with_total else None
+
+    before_key = decode_cursor(before)
+    after_key = decode_cursor(after)
+
+    if before_key:
+        key_created_at, key_id = before_key
+        rows = query.filter(or_(
+            created_at > key_created_at,
+            and_(created_at == key_created_at, item_id > key_id)
+        )).order_by(created_at.asc(), item_id.asc()).limit(per_page + 1).all()
+        has_more = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_prev, has_next = has_more, True
+    else:
+        if after_key:
+            key_created_at, key_id = after_key
+            query = query.filter(or_(
+                created_at < key_created_at,
+                and_(created_at == key_created_at, item_id < key_id)
+            ))
+        rows = query.order_by(created_at.desc(), item_id.desc()).limit(per_page + 1).all()
+        items = rows[:per_page]
+        has_prev, has_next = after_key is not None, len(rows) > per_page
+
+    next_cursor = encode_cursor(items[-1].created_at, items[-1].id) if items and has_next else None
+    prev_cursor = encode_cursor(items[0].created_at, items[0].id) if items and has_prev else None
+    return KeysetPage(items, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total)
@@ -0,0 +1,280 @@
+import base64
+import json
+import re
+from itertools import groupby
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload
+
+from models import db, Post, Comment
+from loaders import load_post_cards
+from pagination import KeysetPage, keyset_paginate
+
+# 게시물/댓글 전문 검색
+# SQLite에서는 FTS5 가상 테이블(search_index)에 n-gram 토큰을 넣어 두고 bm25 점수순으로 찾는다.
+# 한국어는 띄어쓰기 단위로 자르면 조사 때문에 거의 일치하지 않으므로, 한글/한자/가나는 두 글자씩 겹쳐 자른다.
+#   "게임을 했다" -> 게임 임을 했다
+# FTS5를 쓸 수 없는 데이터베이스에서는 게시물 본문 LIKE 검색(최신순)으로 대신한다.
+SEARCH_TABLE = 'search_index'
+KIND_POST = 'post'
+KIND_COMMENT = 'comment'
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def is_cjk(ch):
+    return (
+        '\uac00' <= ch <= '\ud7a3'     # 한글 음절
+        or '\u3130' <= ch <= '\u318f'  # 한글 호환 자모
+        or '\u3040' <= ch <= '\u30ff'  # 히라가나/가타카나
+        or '\u4e00' <= ch <= '\u9fff'  # 한자
+    )
+
+
+def tokenize(text):
+    tokens = []
+    for word in WORD.findall((text or '').lower()):
+        for cjk, chars in groupby(word, key=is_cjk):
+            run = ''.join(chars)
+            if cjk and len(run) > 1:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            else:
+                tokens.append(run)
+    return tokens
+
+
+def match_query(text):
+    # 모든 토큰을 포함하는 문서를 찾는다. 한 글자 한글과 영문/숫자 단어는 앞부분 일치로 찾는다.
+    terms = []
+    for token in dict.fromkeys(tokenize(text)):
+        if len(token) == 1 or not is_cjk(token[0]):
+            terms.append(f'"{token}"*')
+        else:
+            terms.append(f'"{token}"')
+    return ' '.join(terms)
+
+
+# rowid로 게시물과 댓글을 구분한다 (게시물: id*2, 댓글: id*2+1)
+def post_rowid(post_id):
+    return post_id * 2
+
+
+def comment_rowid(comment_id):
+    return comment_id * 2 + 1
+
+
+# ===== 색인 테이블 =====
+_index_ready = {}
+
+
+def search_index_ready(connection):
+    # 색인 테이블이 있는 SQLite에서만 동기화/검색한다 (엔진별로 한 번만 확인)
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _index_ready:
+        _index_ready[key] = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_TABLE,)
+        ).first() is not None
+    return _index_ready[key]
+
+
+def create_search_index():
+    # FTS5를 지원하지 않는 SQLite 빌드/다른 데이터베이스에서는 False (LIKE 검색 사용)
+    if db.engine.dialect.name != 'sqlite':
+        return False
+    try:
+        db.session.execute(db.text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+            "tokens, kind UNINDEXED, post_id UNINDEXED, user_id UNINDEXED, category UNINDEXED, "
+            "tokenize = 'unicode61')"
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Full-text search index unavailable: {e}")
+        return False
+    _index_ready.clear()
+    return True
+
+
+def rebuild_search_index(batch_size=500):
+    # 기존 게시물/댓글을 모두 다시 색인한다
+    if not create_search_index():
+        return 0
+    db.session.execute(db.text(f"DELETE FROM {SEARCH_TABLE}"))
+    connection = db.session.connection()
+    total = 0
+    for post in Post.query.yield_per(batch_size):
+        index_post(connection, post)
+        total += 1
+    comments = db.session.query(Comment, Post.category).join(Post, Comment.post_id == Post.id)
+    for comment, category in comments.yield_per(batch_size):
+        index_comment(connection, comment, category)
+        total += 1
+    db.session.commit()
+    return total
+
+
+def index_post(connection, post):
+    connection.exec_driver_sql(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, tokens, kind, post_id, user_id, category) VALUES (?, ?, ?, ?, ?, ?)",
+        (post_rowid(post.id), ' '.join(tokenize(post.content)), KIND_POST, post.id, post.user_id, post.category)
+    )
+
+
+def index_comment(connection, comment, category):
+    connection.exec_driver_sql(
+        f"INSERT INTO {SEARCH_TABLE} (rowid, tokens, kind, post_id, user_id, category) VALUES (?, ?, ?, ?, ?, ?)",
+        (comment_rowid(comment.id), ' '.join(tokenize(comment.content)), KIND_COMMENT,
+         comment.post_id, comment.user_id, category)
+    )
+
+
+def unindex(connection, rowid):
+    connection.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = ?", (rowid,))
+
+
+def unindex_rows(connection, rowids):
+    # 여러 행을 한 번에 지울 때 (ORM 이벤트를 거치지 않는 일괄 삭제용)
+    if rowids and search_index_ready(connection):
+        connection.exec_driver_sql(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = ?", [(rowid,) for rowid in rowids])
+
+
+# ===== 생성/수정/삭제와 같은 트랜잭션에서 색인 갱신 =====
+@event.listens_for(Post, 'after_insert')
+def _index_new_post(mapper, connection, target):
+    if search_index_ready(connection):
+        index_post(connection, target)
+
+
+@event.listens_for(Post, 'after_update')
+def _reindex_post(mapper, connection, target):
+    # 카운터만 바뀐 경우는 건너뛴다
+    state = db.inspect(target)
+    if not (state.attrs.content.history.has_changes() or state.attrs.category.history.has_changes()):
+        return
+    if search_index_ready(connection):
+        unindex(connection, post_rowid(target.id))
+        index_post(connection, target)
+        if state.attrs.category.history.has_changes():
+            connection.exec_driver_sql(
+                f"UPDATE {SEARCH_TABLE} SET category = ? WHERE post_id = ?", (target.category, target.id)
+            )
+
+
+@event.listens_for(Post, 'after_delete')
+def _unindex_post(mapper, connection, target):
+    # 댓글은 cascade로 함께 삭제되면서 각각 지워진다
+    if search_index_ready(connection):
+        unindex(connection, post_rowid(target.id))
+
+
+@event.listens_for(Comment, 'after_insert')
+def _index_new_comment(mapper, connection, target):
+    if search_index_ready(connection):
+        category = connection.execute(
+            db.select(Post.category).where(Post.id == target.post_id)
+        ).scalar()
+        index_comment(connection, target, category)
+
+
+@event.listens_for(Comment, 'after_delete')
+def _unindex_comment(mapper, connection, target):
+    if search_index_ready(connection):
+        unindex(connection, comment_rowid(target.id))
+
+
+# ===== 검색 =====
+# 검색 결과 한 건. 게시물은 피드와 같은 카드(PostCard), 댓글은 댓글과 그 게시물을 담는다.
+class SearchHit:
+    def __init__(self, kind, card=None, comment=None):
+        self.kind = kind
+        self.card = card
+        self.comment = comment
+
+    @property
+    def post(self):
+        return self.card.post if self.card else self.comment.post
+
+
+def encode_rank_cursor(score, rowid):
+    raw = json.dumps([score, rowid]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_rank_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, rowid = json.loads(raw)
+        return float(score), int(rowid)
+    except (ValueError, TypeError):
+        return None
+
+
+def search(text, viewer=None, category=None, author_id=None, after=None, per_page=10):
+    if not tokenize(text):
+        return KeysetPage([])
+    if search_index_ready(db.session.connection()):
+        return _search_index(text, viewer, category, author_id, after, per_page)
+    return _search_like(text, viewer, category, author_id, after, per_page)
+
+
+def _search_index(text, viewer, category, author_id, after, per_page):
+    # bm25 점수(작을수록 관련도 높음), rowid 순으로 정렬하고 (점수, rowid)를 커서로 쓴다
+    sql = (
+        f"SELECT rowid, kind, bm25({SEARCH_TABLE}) AS score FROM {SEARCH_TABLE} "
+        f"WHERE {SEARCH_TABLE} MATCH :match"
+    )
+    params = {'match': match_query(text), 'limit': per_page + 1}
+    if category:
+        sql += " AND category = :category"
+        params['category'] = category
+    if author_id:
+        sql += " AND user_id = :user_id"
+        params['user_id'] = author_id
+    after_key = decode_rank_cursor(after)
+    if after_key:
+        sql += " AND (score > :score OR (score = :score AND rowid > :rowid))"
+        params['score'], params['rowid'] = after_key
+    sql += " ORDER BY score, rowid LIMIT :limit"
+
+    rows = db.session.execute(db.text(sql), params).all()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    # 게시물/댓글을 종류별로 한 번에 불러와 점수 순서대로 맞춘다
+    post_ids = [row.rowid // 2 for row in rows if row.kind == KIND_POST]
+    comment_ids = [row.rowid // 2 for row in rows if row.kind == KIND_COMMENT]
+    posts = Post.query.options(joinedload(Post.author)).filter(Post.id.in_(post_ids)).all() if post_ids else []
+    cards = {card.post.id: card for card in load_post_cards(posts, viewer)}
+    comments = {
+        comment.id: comment for comment in Comment.query.options(
+            joinedload(Comment.author), joinedload(Comment.post)
+        ).filter(Comment.id.in_(comment_ids))
+    } if comment_ids else {}
+
+    hits = []
+    for row in rows:
+        if row.kind == KIND_POST and row.rowid // 2 in cards:
+            hits.append(SearchHit(KIND_POST, card=cards[row.rowid // 2]))
+        elif row.kind == KIND_COMMENT and row.rowid // 2 in comments:
+            hits.append(SearchHit(KIND_COMMENT, comment=comments[row.rowid // 2]))
+
+    next_cursor = encode_rank_cursor(rows[-1].score, rows[-1].rowid) if rows and has_next else None
+    return KeysetPage(hits, next_cursor=next_cursor, prev_cursor=None)
+
+
+def _search_like(text, viewer, category, author_id, after, per_page):
+    query = Post.query.options(joinedload(Post.author))
+    for word in text.split():
+        query = query.filter(Post.content.contains(word, autoescape=True))
+    if category:
+        query = query.filter(Post.category == category)
+    if author_id:
+        query = query.filter(Post.user_id == author_id)
+    posts = keyset_paginate(query, Post, after=after, per_page=per_page)
+    hits = [SearchHit(KIND_POST, card=card) for card in load_post_cards(posts.items, viewer)]
+    return KeysetPage(hits, next_cursor=posts.next_cursor, prev_cursor=None)
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# 비밀번호 해시/검증
+# 해시 계산(PBKDF2/scrypt)은 CPU를 수백 ms 쓰므로 요청 스레드가 아니라 크기가 정해진 스레드 풀에서 실행한다.
+# hashlib은 계산하는 동안 GIL을 놓기 때문에 풀 크기(PASSWORD_HASH_WORKERS)만큼만 코어를 쓰고,
+# 풀이 가득 차서 PASSWORD_HASH_WAIT초 안에 자리가 나지 않으면 PasswordHashBusy로 바로 거절한다.
+# 해시 방식(PASSWORD_HASH_METHOD)을 바꾸면 기존 사용자는 다음 로그인 때 새 방식으로 다시 저장된다.
+
+
+class PasswordHashBusy(Exception):
+    pass
+
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+def _run(f, *args):
+    global _executor, _slots
+    config = current_app.config
+    with _executor_lock:
+        if _executor is None:
+            workers = config['PASSWORD_HASH_WORKERS']
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            _slots = threading.BoundedSemaphore(workers + config['PASSWORD_HASH_QUEUE'])
+
+    if not _slots.acquire(timeout=config['PASSWORD_HASH_WAIT']):
+        raise PasswordHashBusy()
+    try:
+        future = _executor.submit(f, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+
+def hash_password(password):
+    config = current_app.config
+    return _run(_hash, password, config['PASSWORD_HASH_METHOD'], config['PASSWORD_SALT_LENGTH'])
+
+
+def hash_method(password_hash):
+    return password_hash.split('$', 1)[0]
+
+
+_current_methods = {}
+
+
+def current_method(method):
+    # 'pbkdf2:sha256'처럼 반복 횟수를 생략한 설정도 실제로 저장되는 형식('pbkdf2:sha256:600000')으로 맞춰 비교한다
+    if method not in _current_methods:
+        _current_methods[method] = hash_method(generate_password_hash('', method=method, salt_length=1))
+    return _current_methods[method]
+
+
+def _verify(password_hash, password, method, salt_length):
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if hash_method(password_hash) == current_method(method):
+        return True, None
+    return True, _hash(password, method, salt_length)
+
+
+# 없는 사용자로 로그인할 때도 같은 시간이 걸리도록 비교할 해시 (방식별로 한 번 만든다)
+_dummy_hashes = {}
+
+
+def _verify_unknown(password, method, salt_length):
+    # 없는 사용자도 같은 시간이 걸리도록 더미 해시와 비교한다. 더미 해시도 요청 스레드가 아니라 풀에서 만든다.
+    if method not in _dummy_hashes:
+        _dummy_hashes[method] = _hash('', method, salt_length)
+    check_password_hash(_dummy_hashes[method], password)
+    return False, None
+
+
+def verify_password(password_hash, password):
+    # (일치 여부, 새 해시 또는 None). 해시 방식이 바뀌었으면 같은 작업에서 새 해시를 만들어 돌려준다.
+    config = current_app.config
+    method = config['PASSWORD_HASH_METHOD']
+    if password_hash is None:
+        return _run(_verify_unknown, password, method, config['PASSWORD_SALT_LENGTH'])
+    return _run(_verify, password_hash, password, method, config['PASSWORD_SALT_LENGTH'])
+
+
+# ===== 로그인 시도 제한 =====
+# 사용자 이름별/IP별로 LOGIN_ATTEMPT_WINDOW초 동안의 시도 횟수를 세고, 넘으면 해시를 계산하기 전에 거절한다.
+# 시도는 해시 계산 전에 기록하고(동시에 몰려도 한도를 넘지 않도록), 로그인에 성공하면 사용자 이름 기록은 지운다.
+# 워커 프로세스마다 따로 센다.
+class AttemptLimiter:
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._attempts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, window):
+        # 한도 안이면 시도를 기록하고 True
+        now = time.monotonic()
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts is None:
+                attempts = self._attempts[key] = deque()
+            self._attempts.move_to_end(key)
+            while attempts and attempts[0] <= now - window:
+                attempts.popleft()
+            if len(attempts) >= limit:
+                return False
+            attempts.append(now)
+            while len(self._attempts) > self.max_keys:
+                self._attempts.popitem(last=False)
+            return True
+
+    def reset(self, key):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._attempts.clear()
+
+
+login_attempts = AttemptLimiter()
+
+
+def allow_login_attempt(username, ip):
+    config = current_app.config
+    window = config['LOGIN_ATTEMPT_WINDOW']
+    return (
+        login_attempts.hit(f'ip:{ip}', config['LOGIN_MAX_ATTEMPTS_PER_IP'], window)
+        and login_attempts.hit(f'user:{username.lower()}', config['LOGIN_MAX_ATTEMPTS_PER_USERNAME'], window)
+    )
+
+
+def login_succeeded(username):
+    login_attempts.reset(f'user:{username.lower()}')
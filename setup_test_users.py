@@ -1,9 +1,10 @@
 #!/usr/bin/env python
-import sys
-sys.path.insert(0, '/Users/hyeseong/Documents/파이썬 실습/team_sns')
-from app import app, db, User, Post
+from app import create_app
+from models import db, User, Post
 from werkzeug.security import generate_password_hash
 
+app = create_app()
+
 with app.app_context():
     # Check if test user exists
     test_user = User.query.filter_by(username='testuser').first()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import re
+import uuid
+
+from flask import current_app
+
+from models import db, StoredFile
+
+# 업로드 파일은 내용의 SHA-256으로 이름을 붙여 ab/cd/<해시>.<확장자>에 저장한다.
+# 같은 이미지를 여러 번 올려도 한 벌만 저장되고, 이름이 내용과 묶여 있어 영구 캐시가 가능하다.
+CONTENT_NAME = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{64})(?:_\d+)?\.[a-z0-9]+$')
+CHUNK_SIZE = 64 * 1024
+
+
+def content_name(digest, ext):
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+
+def is_content_name(name):
+    return bool(name and CONTENT_NAME.match(name))
+
+
+def content_digest(name):
+    # 변환본(…_160.webp 등)도 원본과 같은 해시를 돌려준다 (ETag용)
+    match = CONTENT_NAME.match(name or '')
+    return match.group(3) if match else None
+
+
+def upload_path(name):
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], name)
+
+
+def store_stream(stream, ext, directory):
+    # 스트림을 임시 파일로 복사하면서 해시를 계산하고, 해시 이름으로 옮긴다
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}")
+    digest = hashlib.sha256()
+    with open(tmp_path, 'wb') as out:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+
+    name = content_name(digest.hexdigest(), ext)
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    return name
+
+
+# ===== 참조 수 =====
+# 게시물/프로필이 파일을 가리키게 될 때 acquire, 더 이상 가리키지 않을 때 release를 같은 트랜잭션에서 호출한다.
+# 참조 수가 0이 된 파일은 커밋 후 collect_garbage(images.py)가 지운다.
+def acquire(name):
+    # 같은 파일이 처음으로 동시에 올라와도 기본 키 충돌 없이 한쪽이 다른 쪽의 참조 수를 올린다
+    # (INSERT ... ON CONFLICT(name) DO UPDATE SET ref_count = ref_count + 1)
+    if not is_content_name(name):
+        return
+    dialect = db.session.get_bind().dialect.name
+    table = StoredFile.__table__
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        statement = insert(table).values(name=name, ref_count=1).on_conflict_do_update(
+            index_elements=[table.c.name], set_={'ref_count': table.c.ref_count + 1}
+        )
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(name=name, ref_count=1).on_conflict_do_update(
+            index_elements=[table.c.name], set_={'ref_count': table.c.ref_count + 1}
+        )
+    else:
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table).values(name=name, ref_count=1)
+        statement = statement.on_duplicate_key_update(ref_count=table.c.ref_count + 1)
+    db.session.execute(statement)
+
+
+def release(name):
+    if not is_content_name(name):
+        return
+    StoredFile.query.filter_by(name=name).update(
+        {StoredFile.ref_count: StoredFile.ref_count - 1}, synchronize_session=False
+    )
+
+
+def is_referenced(name):
+    return db.session.query(StoredFile.name).filter_by(name=name).first() is not None
+
+
+def claim_unreferenced(names=None):
+    # 참조 수가 0 이하인 행을 지우고, 실제로 지운 이름만 돌려준다 (그 사이 다시 참조된 파일은 건드리지 않음)
+    query = db.session.query(StoredFile.name).filter(StoredFile.ref_count <= 0)
+    if names is not None:
+        names = [name for name in names if is_content_name(name)]
+        if not names:
+            return []
+        query = query.filter(StoredFile.name.in_(names))
+
+    claimed = []
+    for (name,) in query.all():
+        deleted = StoredFile.query.filter(StoredFile.name == name, StoredFile.ref_count <= 0) \
+            .delete(synchronize_session=False)
+        if deleted:
+            claimed.append(name)
+    db.session.commit()
+    return claimed
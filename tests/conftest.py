@@ -0,0 +1,51 @@
+import pytest
+
+from app import create_app, upgrade_schema
+from config import Config, engine_options
+from models import db, User
+
+
+# 임시 SQLite 데이터베이스에 create_all + 마이그레이션을 적용한 앱. 승인된 사용자 alice, bob이 있다.
+# 백그라운드 작업(알림 작성기, 이미지 처리, 사용자 정리)은 요청 안에서 바로 실행한다.
+@pytest.fixture
+def app(tmp_path):
+    database_uri = 'sqlite:///' + str(tmp_path / 'test.db')
+
+    class TestConfig(Config):
+        TESTING = True
+        WTF_CSRF_ENABLED = False
+        SQLALCHEMY_DATABASE_URI = database_uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(database_uri)
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        RAW_UPLOAD_FOLDER = str(tmp_path / 'raw_uploads')
+        FRAGMENT_CACHE = 'none'
+        NOTIFICATION_ASYNC = False
+        NOTIFICATION_STREAM_ENABLED = False
+        IMAGE_PROCESSING_ASYNC = False
+        USER_PURGE_ASYNC = False
+        USER_CACHE_TTL = 0
+        METRICS_ENABLED = False
+        PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+        LOGIN_MAX_ATTEMPTS_PER_IP = 10000
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        upgrade_schema()
+        for username in ('alice', 'bob'):
+            user = User(username=username, email=f'{username}@example.com', display_name=username, is_approved=True)
+            user.set_password('secret1')
+            db.session.add(user)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def login(app):
+    # login('alice') -> 로그인된 테스트 클라이언트
+    def login(username):
+        client = app.test_client()
+        client.post('/login', data={'username': username, 'password': 'secret1'})
+        return client
+    return login
@@ -0,0 +1,80 @@
+from models import db, User, Post
+
+
+# 피드/게시물/프로필 페이지의 조건부 GET (conditional.py)
+def add_post(app):
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').first()
+        post = Post(content='post', category='일상', user_id=alice.id)
+        db.session.add(post)
+        db.session.commit()
+        return post.id, alice.id
+
+
+def page_client(login):
+    client = login('bob')
+    # 로그인 안내 같은 남은 플래시 메시지를 먼저 비운다
+    client.get('/feed')
+    return client
+
+
+def test_matching_etag_returns_304(app, login):
+    post_id, alice_id = add_post(app)
+    client = page_client(login)
+
+    for url in ('/feed', f'/post/{post_id}', f'/profile/{alice_id}'):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers['ETag']
+        assert 'private' in response.headers['Cache-Control']
+
+        response = client.get(url, headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.headers['ETag'] == etag
+        assert not response.data
+
+
+def test_like_changes_etag(app, login):
+    post_id, _ = add_post(app)
+    client = page_client(login)
+    etag = client.get('/feed').headers['ETag']
+
+    client.put(f'/post/{post_id}/like')
+    response = client.get('/feed', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_other_user_gets_own_etag(app, login):
+    add_post(app)
+    etag = page_client(login).get('/feed').headers['ETag']
+
+    alice = login('alice')
+    alice.get('/feed')
+    assert alice.get('/feed', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_no_304_with_pending_flash(app, login):
+    add_post(app)
+    client = page_client(login)
+    etag = client.get('/feed').headers['ETag']
+
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', '저장되었습니다')]
+    response = client.get('/feed', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert '저장되었습니다' in response.get_data(as_text=True)
+    assert 'ETag' not in response.headers
+
+    # 플래시를 보여 준 뒤에는 다시 304
+    assert client.get('/feed', headers={'If-None-Match': etag}).status_code == 304
+
+
+def test_disabled_page_etags(app, login):
+    app.config['PAGE_ETAGS'] = False
+    add_post(app)
+    client = page_client(login)
+
+    response = client.get('/feed')
+    assert 'ETag' not in response.headers
+    assert client.get('/feed', headers={'If-None-Match': '*'}).status_code == 200
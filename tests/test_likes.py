@@ -0,0 +1,73 @@
+import threading
+
+from models import db, User, Post, Comment, post_likes
+
+
+# 좋아요 PUT/DELETE는 같은 요청을 여러 번 보내도(동시에 보내도) 카운터와 알림이 한 번만 바뀐다
+def add_post(app):
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').first()
+        post = Post(content='post', category='일상', user_id=alice.id)
+        db.session.add(post)
+        db.session.flush()
+        comment = Comment(content='comment', post_id=post.id, user_id=alice.id)
+        db.session.add(comment)
+        db.session.commit()
+        return post.id, comment.id
+
+
+def counts(app, post_id):
+    with app.app_context():
+        post = db.session.get(Post, post_id)
+        alice = User.query.filter_by(username='alice').first()
+        likes = db.session.query(post_likes).filter(post_likes.c.post_id == post_id).count()
+        return post.likes_count, likes, alice.unread_notifications_count
+
+
+def test_post_like_is_idempotent(app, login):
+    post_id, _ = add_post(app)
+    client = login('bob')
+
+    for _ in range(2):
+        response = client.put(f'/post/{post_id}/like')
+        assert response.status_code == 200
+        assert response.get_json()['likes_count'] == 1
+    assert counts(app, post_id) == (1, 1, 1)
+
+    for _ in range(2):
+        response = client.delete(f'/post/{post_id}/like')
+        assert response.status_code == 200
+        assert response.get_json()['likes_count'] == 0
+    assert counts(app, post_id) == (0, 0, 1)
+
+
+def test_comment_like_is_idempotent(app, login):
+    _, comment_id = add_post(app)
+    client = login('bob')
+
+    for _ in range(2):
+        assert client.put(f'/comment/{comment_id}/like').get_json()['likes_count'] == 1
+    for _ in range(2):
+        assert client.delete(f'/comment/{comment_id}/like').get_json()['likes_count'] == 0
+    with app.app_context():
+        assert db.session.get(Comment, comment_id).likes_count == 0
+
+
+def test_concurrent_post_likes_count_once(app, login):
+    post_id, _ = add_post(app)
+    clients = [login('bob') for _ in range(8)]
+    barrier = threading.Barrier(len(clients))
+    statuses = []
+
+    def like(client):
+        barrier.wait()
+        statuses.append(client.put(f'/post/{post_id}/like').status_code)
+
+    threads = [threading.Thread(target=like, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200] * len(clients)
+    assert counts(app, post_id) == (1, 1, 1)
@@ -0,0 +1,85 @@
+import pytest
+
+from models import db, User, Notification
+
+
+# 알림 읽음 처리(하나/여러 개/전체)와 저장된 미읽음 카운터가 어긋나지 않는지 확인한다
+def add_notifications(app, count):
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').first()
+        bob = User.query.filter_by(username='bob').first()
+        notifications = [
+            Notification(user_id=alice.id, type='approval', related_user_id=bob.id) for _ in range(count)
+        ]
+        db.session.add_all(notifications)
+        db.session.commit()
+        return [notification.id for notification in notifications]
+
+
+def unread(app, client):
+    counter = client.get('/api/notifications/unread-count').get_json()['count']
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').first()
+        actual = Notification.query.filter_by(user_id=alice.id, is_read=False).count()
+    assert counter == actual
+    return counter
+
+
+def test_bulk_read_by_ids(app, login):
+    ids = add_notifications(app, 4)
+    client = login('alice')
+    assert unread(app, client) == 4
+
+    response = client.post('/notifications/read', json={'ids': ids[:2]})
+    assert response.get_json() == {'success': True, 'updated': 2}
+    assert unread(app, client) == 2
+
+    # 이미 읽은 알림을 다시 보내도 카운터는 다시 줄지 않는다
+    response = client.post('/notifications/read', json={'ids': ids[:3]})
+    assert response.get_json() == {'success': True, 'updated': 1}
+    assert unread(app, client) == 1
+
+
+def test_bulk_read_all(app, login):
+    add_notifications(app, 3)
+    client = login('alice')
+
+    assert client.post('/notifications/read', json={'all': True}).get_json()['updated'] == 3
+    assert unread(app, client) == 0
+    assert client.post('/notifications/read', json={'all': True}).get_json()['updated'] == 0
+    assert unread(app, client) == 0
+
+
+def test_bulk_read_ignores_other_users(app, login):
+    ids = add_notifications(app, 2)
+    client = login('bob')
+
+    assert client.post('/notifications/read', json={'ids': ids}).get_json()['updated'] == 0
+    assert unread(app, login('alice')) == 2
+
+
+def test_bulk_read_empty_list(app, login):
+    add_notifications(app, 1)
+    client = login('alice')
+
+    assert client.post('/notifications/read', json={'ids': []}).get_json() == {'success': True, 'updated': 0}
+    assert unread(app, client) == 1
+
+
+@pytest.mark.parametrize('body', [[1, 2], 'all', {'ids': 'x'}, {'ids': ['x']}, {}])
+def test_bulk_read_rejects_bad_body(app, login, body):
+    add_notifications(app, 1)
+    client = login('alice')
+
+    assert client.post('/notifications/read', json=body).status_code == 400
+    assert unread(app, client) == 1
+
+
+def test_single_read_counts_once(app, login):
+    notification_id, = add_notifications(app, 1)
+    client = login('alice')
+
+    for _ in range(2):
+        assert client.post(f'/notification/{notification_id}/read').status_code == 200
+    assert unread(app, client) == 0
+    assert login('bob').post(f'/notification/{notification_id}/read').status_code == 403
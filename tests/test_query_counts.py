@@ -0,0 +1,75 @@
+from sqlalchemy import event
+
+from models import db, User, Post
+
+
+# 피드/프로필/게시물 페이지의 쿼리 수가 게시물 수에 따라 늘어나지 않는지 확인한다 (loaders.py)
+def add_posts(app, client, count):
+    # 절반은 alice, 나머지는 모두 다른 작성자의 게시물에 댓글 2개와 좋아요를 달아 둔다
+    with app.app_context():
+        alice = User.query.filter_by(username='alice').first()
+        start = User.query.count()
+        authors = [
+            User(username=f'author{start + i}', email=f'author{start + i}@example.com',
+                 display_name=f'author {start + i}', password_hash='-', is_approved=True)
+            for i in range(count)
+        ]
+        db.session.add_all(authors)
+        db.session.flush()
+        posts = [
+            Post(content=f'post {i}', category='일상', user_id=alice.id if i % 2 == 0 else author.id)
+            for i, author in enumerate(authors)
+        ]
+        db.session.add_all(posts)
+        db.session.commit()
+        post_ids = [post.id for post in posts]
+    for post_id in post_ids:
+        client.put(f'/post/{post_id}/like')
+        for i in range(2):
+            client.post(f'/post/{post_id}/comment/add', data={'content': f'comment {i}'})
+    return post_ids
+
+
+def count_queries(app, client, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+def page_urls(app, post_id):
+    with app.app_context():
+        user_id = User.query.filter_by(username='alice').first().id
+    return {
+        'feed': '/feed',
+        'profile': f'/profile/{user_id}',
+        'post': f'/post/{post_id}',
+    }
+
+
+def test_page_query_counts_do_not_grow_with_posts(app, login):
+    client = login('alice')
+    post_id = add_posts(app, client, 2)[0]
+    urls = page_urls(app, post_id)
+    small = {name: count_queries(app, client, url) for name, url in urls.items()}
+
+    # 게시물 페이지 수(10개)를 넘기고, 게시물 하나에는 댓글을 더 단다
+    bob = login('bob')
+    add_posts(app, bob, 20)
+    for i in range(5):
+        for commenter in (client, bob):
+            commenter.post(f'/post/{post_id}/comment/add', data={'content': f'more {i}'})
+    large = {name: count_queries(app, client, url) for name, url in urls.items()}
+
+    assert large == small
+    assert max(large.values()) <= 8
@@ -0,0 +1,20 @@
+import pytest
+
+import migrations
+
+
+# 새로 만든 데이터베이스(create_all + 마이그레이션)에서 주요 쿼리가 모두 인덱스를 타야 한다
+def test_hot_queries_use_indexes(app):
+    with app.app_context():
+        assert migrations.check_query_plans() == {}
+
+
+@pytest.mark.parametrize('detail, full_scan', [
+    ('SCAN post', True),
+    ('SCAN TABLE post', True),
+    ('SCAN post USING INDEX ix_post_created_at', False),
+    ('SCAN TABLE post USING COVERING INDEX ix_post_created_at', False),
+    ('SEARCH post USING INDEX ix_post_user_id_created_at (user_id=?)', False),
+])
+def test_full_scan_matches_both_sqlite_wordings(detail, full_scan):
+    assert bool(migrations.FULL_SCAN.match(detail)) == full_scan
@@ -0,0 +1,30 @@
+import threading
+
+import security
+from security import verify_password
+
+
+def test_unknown_user_hashes_on_pool(app, monkeypatch):
+    # 없는 사용자의 더미 해시도 요청 스레드가 아니라 해시 풀에서 만든다.
+    threads = []
+    original = security._hash
+
+    def recording_hash(*args):
+        threads.append(threading.current_thread().name)
+        return original(*args)
+
+    monkeypatch.setattr(security, '_hash', recording_hash)
+    monkeypatch.setattr(security, '_dummy_hashes', {})
+    with app.app_context():
+        assert verify_password(None, 'secret1') == (False, None)
+        assert verify_password(None, 'secret1') == (False, None)
+    assert len(threads) == 1
+    assert threads[0].startswith('password-hash')
+
+
+def test_unknown_user_login_fails(app):
+    client = app.test_client()
+    response = client.post('/login', data={'username': 'nobody', 'password': 'secret1'})
+    assert response.status_code == 200
+    with client.session_transaction() as session:
+        assert '_user_id' not in session
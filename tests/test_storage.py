@@ -0,0 +1,98 @@
+import io
+import os
+
+from PIL import Image
+
+import storage
+from images import collect_garbage, variant_filename, VARIANT_SIZES
+from models import db, Post, StoredFile
+
+
+# 내용 해시 저장소의 참조 수: 같은 이미지는 한 벌만 저장되고, 마지막 참조가 사라진 뒤에만 파일을 지운다
+def image_upload():
+    data = io.BytesIO()
+    Image.new('RGB', (64, 48), (200, 80, 40)).save(data, 'PNG')
+    data.seek(0)
+    return data, 'photo.png'
+
+
+def create_post(client):
+    response = client.post('/post/create', data={
+        'category': '일상', 'content': 'photo', 'image': image_upload()
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+
+
+def post_images(app):
+    with app.app_context():
+        return [(post.id, post.image_filename) for post in Post.query.order_by(Post.id)]
+
+
+def ref_count(app, name):
+    with app.app_context():
+        return db.session.query(StoredFile.ref_count).filter_by(name=name).scalar()
+
+
+def stored_paths(app, name):
+    folder = app.config['UPLOAD_FOLDER']
+    paths = [os.path.join(folder, name)]
+    for size in VARIANT_SIZES:
+        for fmt in ('webp', 'fallback'):
+            paths.append(os.path.join(folder, variant_filename(name, size, fmt)))
+    return paths
+
+
+def test_shared_image_deleted_with_last_post(app, login):
+    client = login('alice')
+    create_post(client)
+    create_post(client)
+    (first_id, name), (second_id, second_name) = post_images(app)
+    assert name == second_name
+    assert storage.is_content_name(name)
+    assert ref_count(app, name) == 2
+    assert all(os.path.exists(path) for path in stored_paths(app, name))
+
+    client.post(f'/post/{first_id}/delete')
+    assert ref_count(app, name) == 1
+    assert all(os.path.exists(path) for path in stored_paths(app, name))
+
+    client.post(f'/post/{second_id}/delete')
+    assert ref_count(app, name) is None
+    assert not any(os.path.exists(path) for path in stored_paths(app, name))
+    assert not os.path.exists(os.path.join(app.config['RAW_UPLOAD_FOLDER'], name))
+
+
+def test_collect_garbage_keeps_referenced_files(app):
+    name = storage.content_name('ab' * 32, 'png')
+    with app.app_context():
+        storage.acquire(name)
+        storage.acquire(name)
+        db.session.commit()
+        assert ref_count(app, name) == 2
+
+        storage.release(name)
+        db.session.commit()
+        assert collect_garbage() == []
+        assert ref_count(app, name) == 1
+
+        storage.release(name)
+        db.session.commit()
+        assert collect_garbage([name]) == [name]
+        assert ref_count(app, name) is None
+
+        # 이미 지운 행을 다시 해제해도 음수 행이 생기지 않는다
+        storage.release(name)
+        db.session.commit()
+        assert collect_garbage() == []
+
+
+def test_reacquire_before_collect_keeps_file(app):
+    name = storage.content_name('cd' * 32, 'png')
+    with app.app_context():
+        storage.acquire(name)
+        db.session.commit()
+        storage.release(name)
+        storage.acquire(name)
+        db.session.commit()
+        assert collect_garbage([name]) == []
+        assert ref_count(app, name) == 1